@@ -1,4 +1,5 @@
 import os
+import re
 import uvicorn
 import uuid
 import asyncio
@@ -7,6 +8,8 @@ import logging
 from datetime import datetime
 from typing import List, Dict, Any, Optional, AsyncGenerator
 
+import numpy as np
+
 # FastAPI imports
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.responses import StreamingResponse, JSONResponse
@@ -90,70 +93,73 @@ class PDFProcessor:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
     
-    def extract_text(self, file_path: str):
-        """Extract text from PDF file."""
+    def extract_pages(self, file_path: str):
+        """Extract the text of each page as {'page', 'text', 'start', 'end'} records.
+        
+        start and end are the page's character span in the page texts
+        joined by a blank line.
+        """
         try:
-            text = ""
-            pages = 0
+            pages = []
+            offset = 0
             
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
-                pages = len(pdf_reader.pages)
                 
-                for page_num in range(pages):
-                    page = pdf_reader.pages[page_num]
-                    page_text = page.extract_text()
-                    
-                    if page_text:
-                        text += f"--- Page {page_num + 1} ---\n{page_text}\n\n"
+                for page_num, page in enumerate(pdf_reader.pages, start=1):
+                    page_text = page.extract_text() or ""
+                    pages.append({
+                        'page': page_num,
+                        'text': page_text,
+                        'start': offset,
+                        'end': offset + len(page_text)
+                    })
+                    offset += len(page_text) + 2
             
-            logger.info(f"Extracted text from {pages} pages")
-            return text, pages
+            logger.info(f"Extracted text from {len(pages)} pages")
+            return pages
             
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {e}")
             raise
     
-    def chunk_text(self, text: str, filename: str, file_id: str):
-        """Split text into chunks."""
+    def chunk_pages(self, pages: List[Dict], filename: str, file_id: str):
+        """Split each page into chunks of about chunk_size characters, overlapping by chunk_overlap.
+        
+        Chunks never span pages; each records its page and character span.
+        """
         try:
-            # Simple chunking by character count
             chunks = []
-            words = text.split()
-            
-            current_chunk = []
-            current_length = 0
-            
-            for word in words:
-                current_chunk.append(word)
-                current_length += len(word) + 1  # +1 for space
+            for page in pages:
+                spans = [match.span() for match in re.finditer(r'\S+', page['text'])]
+                words = [page['text'][a:b] for a, b in spans]
                 
-                if current_length >= self.chunk_size:
-                    chunk_text = ' '.join(current_chunk)
+                # Character offset of each word in the space-joined text
+                lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words)) + 1
+                offsets = np.concatenate(([0], np.cumsum(lengths)))
+                
+                start = 0
+                while start < len(words):
+                    # First word boundary at or past chunk_size characters
+                    end = int(np.searchsorted(offsets, offsets[start] + self.chunk_size))
+                    end = min(max(end, start + 1), len(words))
                     chunks.append({
-                        'text': chunk_text,
+                        'text': ' '.join(words[start:end]),
                         'metadata': {
                             'source': filename,
                             'file_id': file_id,
                             'chunk_index': len(chunks),
-                            'total_chunks': 0  # Will be updated
+                            'total_chunks': 0,  # Will be updated
+                            'page': page['page'],
+                            'start_char': page['start'] + spans[start][0],
+                            'end_char': page['start'] + spans[end - 1][1]
                         }
                     })
-                    current_chunk = []
-                    current_length = 0
-            
-            # Add the last chunk if not empty
-            if current_chunk:
-                chunk_text = ' '.join(current_chunk)
-                chunks.append({
-                    'text': chunk_text,
-                    'metadata': {
-                        'source': filename,
-                        'file_id': file_id,
-                        'chunk_index': len(chunks),
-                        'total_chunks': len(chunks)
-                    }
-                })
+                    if end == len(words):
+                        break
+                    # Start the next chunk chunk_overlap characters back
+                    next_start = int(np.searchsorted(offsets, offsets[end] - self.chunk_overlap))
+                    start = max(next_start, start + 1)
             
             # Update total_chunks in all chunks
             for chunk in chunks:
@@ -292,8 +298,8 @@ class RAGService:
                     
                     try:
                         # Process PDF
-                        text, pages = self.pdf_processor.extract_text(file_info['file_path'])
-                        chunks = self.pdf_processor.chunk_text(text, file_info['filename'], file_info['file_id'])
+                        pages = self.pdf_processor.extract_pages(file_info['file_path'])
+                        chunks = self.pdf_processor.chunk_pages(pages, file_info['filename'], file_info['file_id'])
                         
                         # Generate embeddings
                         texts = [chunk['text'] for chunk in chunks]
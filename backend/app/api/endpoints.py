@@ -1,18 +1,21 @@
 import os
 import uuid
 from datetime import datetime
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
 from fastapi.responses import StreamingResponse, JSONResponse
-import aiofiles
 import asyncio
-from typing import List
+from typing import List, Optional
 
 from app.core.config import settings
 from app.models.schemas import (
     HealthResponse, UploadResponse, QueryRequest,
-    SourceDocument, StreamingChunk, ErrorResponse
+    SourceDocument, StreamingChunk, ErrorResponse, JobStatusResponse,
+    DocumentInfo, DocumentListResponse, BatchQueryRequest, BatchQueryResponse,
+    BatchQueryResult
 )
 from app.services.rag_service import RAGService
+from app.services.job_store import JOB_QUEUED, JOB_PROCESSING, JOB_DONE
+from app.utils.helpers import save_upload_file, UploadTooLargeError
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,9 +30,16 @@ rag_service = RAGService()
 @router.on_event("startup")
 async def startup_event():
     """Start background tasks on startup."""
-    asyncio.create_task(rag_service.process_upload_queue())
+    rag_service.start_workers()
     logger.info("Started RAG service queue processing")
 
+@router.on_event("shutdown")
+async def shutdown_event():
+    """Stop ingestion workers and pools on shutdown."""
+    await rag_service.stop_workers()
+    rag_service.shutdown()
+    logger.info("Stopped RAG service ingestion pools")
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint."""
@@ -45,46 +55,89 @@ async def health_check():
         logger.error(f"Health check failed: {e}")
         raise HTTPException(status_code=500, detail="Service unhealthy")
 
+def _queue_full_error() -> HTTPException:
+    """429 response used when the ingestion queue is at capacity."""
+    return HTTPException(
+        status_code=429,
+        detail="Ingestion queue is full, retry later",
+        headers={"Retry-After": "5"}
+    )
+
+async def _receive_upload(file: UploadFile):
+    """Validate a PDF upload and stream it to a temporary file; returns (path, size, hash)."""
+    # Validate file type
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    
+    # Stream to a temporary name, hashing and enforcing the size limit as we write
+    temp_path = os.path.join(settings.UPLOAD_DIR, f".{uuid.uuid4().hex}.part")
+    try:
+        file_size, content_hash = await save_upload_file(
+            file, temp_path,
+            chunk_size=settings.UPLOAD_CHUNK_SIZE,
+            max_size=settings.MAX_UPLOAD_SIZE
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return temp_path, file_size, content_hash
+
 @router.post("/upload", response_model=UploadResponse)
-async def upload_file(file: UploadFile = File(...)):
-    """Upload and process PDF file."""
+async def upload_file(file: UploadFile = File(...), force: bool = False):
+    """Upload and process PDF file.
+    
+    Files identical to an already uploaded one resolve to the existing
+    file_id unless `force` is set.
+    """
     try:
-        # Validate file type
-        if not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+        filename = file.filename
+        temp_path, file_size, content_hash = await _receive_upload(file)
         
-        # Validate file size
-        file.file.seek(0, 2)  # Seek to end
-        file_size = file.file.tell()
-        file.file.seek(0)  # Reset to beginning
+        # Short-circuit identical files to the existing document
+        duplicate = None if force else rag_service.find_duplicate(content_hash)
+        if duplicate is not None:
+            os.remove(temp_path)
+            logger.info(f"Upload {filename} is a duplicate of {duplicate['file_id']}")
+            return UploadResponse(
+                filename=duplicate["filename"],
+                file_id=duplicate["file_id"],
+                size=file_size,
+                pages=duplicate["pages"],
+                chunks=duplicate["chunks"],
+                status=duplicate["status"],
+                duplicate=True
+            )
         
-        if file_size > settings.MAX_UPLOAD_SIZE:
-            raise HTTPException(status_code=400, detail="File too large (max 10MB)")
+        # Reject when the ingestion queue is saturated
+        if rag_service.queue_full():
+            os.remove(temp_path)
+            raise _queue_full_error()
         
         # Generate unique file ID
         file_id = str(uuid.uuid4())
-        filename = file.filename
         safe_filename = f"{file_id}_{filename}"
         file_path = os.path.join(settings.UPLOAD_DIR, safe_filename)
-        
-        # Save file temporarily
-        async with aiofiles.open(file_path, 'wb') as out_file:
-            content = await file.read()
-            await out_file.write(content)
+        os.replace(temp_path, file_path)
         
         logger.info(f"Uploaded file: {filename} ({file_size} bytes)")
         
         # Add to processing queue
-        queue_size = await rag_service.add_to_queue(file_path, filename, file_id)
+        try:
+            queue_size = await rag_service.add_to_queue(
+                file_path, filename, file_id, file_size, content_hash
+            )
+        except asyncio.QueueFull:
+            os.remove(file_path)
+            raise _queue_full_error()
         
-        # Return immediate response
+        # Return immediate response; pages and chunks fill in once processed
+        job = rag_service.get_job(file_id)
         return UploadResponse(
             filename=filename,
             file_id=file_id,
             size=file_size,
-            pages=0,  # Will be updated after processing
-            chunks=0,  # Will be updated after processing
-            status="queued"
+            pages=job["pages"],
+            chunks=job["chunks"],
+            status=job["status"]
         )
         
     except HTTPException:
@@ -102,7 +155,8 @@ async def query_documents(query_request: QueryRequest):
         try:
             async for chunk in rag_service.query_documents(
                 query=query_request.query,
-                top_k=query_request.top_k
+                top_k=query_request.top_k,
+                filters=query_request.filters
             ):
                 yield chunk.encode('utf-8')
                 
@@ -124,32 +178,150 @@ async def query_documents(query_request: QueryRequest):
         }
     )
 
-@router.get("/documents")
-async def list_documents():
-    """List all processed documents."""
+@router.post("/query/batch", response_model=BatchQueryResponse)
+async def query_batch(batch_request: BatchQueryRequest):
+    """Retrieve sources for many queries at once (no answer generation).
+    
+    Meant for evaluation and analytics jobs: the queries are embedded in
+    one batch and searched together, returning plain JSON.
+    """
+    try:
+        start_time = datetime.now()
+        results = await rag_service.search_batch(
+            batch_request.queries,
+            top_k=batch_request.top_k,
+            filters=batch_request.filters
+        )
+        return BatchQueryResponse(
+            results=[
+                BatchQueryResult(query=query, sources=sources)
+                for query, sources in zip(batch_request.queries, results)
+            ],
+            processing_time=(datetime.now() - start_time).total_seconds()
+        )
+    
+    except Exception as e:
+        logger.error(f"Batch query error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/documents", response_model=DocumentListResponse)
+async def list_documents(limit: int = Query(default=50, ge=1, le=1000), cursor: Optional[str] = None):
+    """List documents from the catalog, `limit` at a time.
+    
+    Pages are keyed on catalog position, so fetching page N costs the same
+    as page 1; pass the returned `next_cursor` to continue.
+    """
     try:
-        # This would require additional methods in VectorStore
-        # For now, return placeholder
+        try:
+            after = int(cursor) if cursor else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        
+        documents, next_cursor = rag_service.list_documents(limit, after)
         stats = rag_service.get_stats()
-        return {
-            "total_documents": stats["documents"],
-            "total_chunks": stats["chunks"],
-            "documents": []  # Would list actual documents in production
-        }
+        return DocumentListResponse(
+            total_documents=stats["documents"],
+            total_chunks=stats["chunks"],
+            documents=[DocumentInfo(**document) for document in documents],
+            next_cursor=str(next_cursor) if next_cursor is not None else None
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing documents: {e}")
         raise HTTPException(status_code=500, detail="Failed to list documents")
 
+@router.get("/documents/{file_id}/status", response_model=JobStatusResponse)
+async def document_status(file_id: str):
+    """Get ingestion status for a document."""
+    job = rag_service.get_job(file_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Document {file_id} not found")
+    dedup_ratio = job["reused_chunks"] / job["chunks"] if job["chunks"] else None
+    return JobStatusResponse(**job, dedup_ratio=dedup_ratio)
+
+@router.put("/documents/{file_id}", response_model=UploadResponse)
+async def replace_document(file_id: str, file: UploadFile = File(...)):
+    """Replace a document with a new revision.
+    
+    The new PDF keeps the document's file_id. Only chunks whose text changed
+    are embedded again; chunks missing from the new revision are deleted.
+    """
+    try:
+        job = rag_service.get_job(file_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Document {file_id} not found")
+        if job["status"] in (JOB_QUEUED, JOB_PROCESSING):
+            raise HTTPException(status_code=409, detail=f"Document {file_id} is still being ingested")
+        
+        filename = file.filename
+        temp_path, file_size, content_hash = await _receive_upload(file)
+        
+        # Same bytes as the stored revision: nothing to do, unless the last replace
+        # failed and left the index to be repaired
+        if job["status"] == JOB_DONE and not job["error"] and content_hash == job["content_hash"]:
+            os.remove(temp_path)
+            return UploadResponse(
+                filename=job["filename"],
+                file_id=file_id,
+                size=file_size,
+                pages=job["pages"],
+                chunks=job["chunks"],
+                status=job["status"],
+                duplicate=True
+            )
+        
+        if rag_service.queue_full():
+            os.remove(temp_path)
+            raise _queue_full_error()
+        
+        # Saved under its own name: the stored revision's upload stays intact until
+        # the new one is ingested, then it is removed
+        file_path = os.path.join(settings.UPLOAD_DIR, f"{file_id}_{uuid.uuid4().hex[:8]}_{filename}")
+        os.replace(temp_path, file_path)
+        
+        logger.info(f"Replacing document {file_id} with {filename} ({file_size} bytes)")
+        
+        try:
+            await rag_service.add_to_queue(
+                file_path, filename, file_id, file_size, content_hash, replace=True
+            )
+        except asyncio.QueueFull:
+            os.remove(file_path)
+            raise _queue_full_error()
+        
+        # Pages and chunks of the new revision fill in once it is processed
+        job = rag_service.get_job(file_id)
+        return UploadResponse(
+            filename=filename,
+            file_id=file_id,
+            size=file_size,
+            status=job["status"]
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Replace error for {file_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Replace failed: {str(e)}")
+
 @router.delete("/documents/{file_id}")
 async def delete_document(file_id: str):
     """Delete document by file ID."""
     try:
-        # This would require delete method in VectorStore
-        # For now, return placeholder
+        job = rag_service.get_job(file_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Document {file_id} not found")
+        if job["status"] in (JOB_QUEUED, JOB_PROCESSING):
+            raise HTTPException(status_code=409, detail=f"Document {file_id} is still being ingested")
+        
+        await rag_service.delete_document(file_id)
         return {
             "message": f"Document {file_id} deleted successfully",
             "file_id": file_id
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error deleting document: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete document")
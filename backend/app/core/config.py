@@ -19,20 +19,66 @@ class Settings(BaseSettings):
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_EXTENSIONS: List[str] = [".pdf"]
     UPLOAD_DIR: str = "uploads"
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # Bytes read per step when saving uploads
     
     # Vector store settings
     VECTOR_STORE_PATH: str = "./data/chroma_db"
+    VECTOR_STORE_BACKEND: str = "chroma"  # "chroma" (HNSW) or "numpy" (exact search over a float32 matrix)
+    VECTOR_STORE_MMAP: bool = True  # numpy backend: map stored embeddings (shared by worker processes) instead of reading them
+    VECTOR_QUANTIZATION: str = "none"  # numpy backend: "none", "float16" or "int8" copy scanned by searches
+    VECTOR_RESCORE_FACTOR: int = 4  # Quantized search rescores top_k * this many candidates in float32
     COLLECTION_NAME: str = "neuroquery_documents"
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_SIZE: int = 1024
+    
+    # Hybrid retrieval settings
+    HYBRID_SEARCH_ENABLED: bool = True  # Fuse BM25 keyword matches with vector search results
+    LEXICAL_INDEX_PATH: str = "./data/lexical_index"
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    BM25_MAX_POSTINGS: int = 0  # Skip query terms found in more chunks than this; 0 keeps every term
+    HYBRID_CANDIDATES: int = 20  # Results taken from each retriever before fusion
+    RRF_K: int = 60  # Reciprocal rank fusion constant
+    
+    # Reranking settings
+    RERANK_ENABLED: bool = False  # Rerank retrieved candidates with a cross-encoder
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 50  # Candidates retrieved and scored per query
+    RERANK_BUDGET_MS: float = 300.0  # Slower reranks are abandoned and results keep retrieval order
     
     # Embedding settings
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     EMBEDDING_DIMENSION: int = 384
+    EMBEDDING_BATCH_SIZE: int = 64  # Chunks embedded and written per batch during ingestion
+    CHUNK_CACHE_ENABLED: bool = True  # Reuse embeddings of previously seen chunk text
+    CHUNK_CACHE_PATH: str = "./data/chunk_embeddings.db"
+    QUERY_EMBEDDING_CACHE_SIZE: int = 2048  # 0 disables the cache
+    QUERY_EMBEDDING_CACHE_TTL: int = 3600  # Seconds; 0 means no expiry
+    QUERY_BATCH_MAX_SIZE: int = 32  # Max queries encoded in one batch
+    QUERY_BATCH_MAX_WAIT_MS: float = 3.0  # Max time a query waits for its batch to fill
     
     # Text processing settings
-    CHUNK_SIZE: int = 1000
+    CHUNKER: str = "tokens"  # "tokens" (embedding-model tokens) or "characters"
+    CHUNK_TOKENS: int = 250  # Fits the 256-token window of MiniLM with room for special tokens
+    CHUNK_TOKEN_OVERLAP: int = 50
+    CHUNK_SIZE: int = 1000  # Characters, used when CHUNKER is "characters"
     CHUNK_OVERLAP: int = 200
+    PDF_EXTRACTOR: str = "auto"  # "pypdfium2", "pymupdf", "pypdf2", or "auto" for the first installed
+    PDF_EXTRACT_WORKERS: int = 1  # Processes extracting page ranges in parallel; 0 = one per CPU
+    PDF_PARALLEL_MIN_PAGES: int = 32  # Smaller PDFs are extracted in-process
+    
+    # Ingestion settings
+    INGEST_EXECUTOR: str = "thread"  # "thread" or "process"
+    INGEST_WORKERS: int = 2
+    INGEST_CONCURRENCY: int = 2  # Number of concurrent ingestion jobs
+    INGEST_QUEUE_MAXSIZE: int = 1000  # Uploads beyond this are rejected with 429
+    JOB_STORE_PATH: str = "./data/ingest_jobs.db"
+    VECTOR_WRITE_BATCH_SIZE: int = 1000  # Rows coalesced per vector store write; 0 writes each batch directly
+    VECTOR_WRITE_FLUSH_MS: float = 50.0  # Max time rows wait for a write to fill
+    VECTOR_WRITE_MAX_PENDING_ROWS: int = 4000  # Ingest jobs wait while this many rows are queued for writing; 0 for no limit
     
     # LLM settings (Optional - for using OpenAI)
+    GENERATOR: str = "template"  # "template" (canned answer), "openai" (needs OPENAI_API_KEY) or "stub" (local fake LLM)
     OPENAI_API_KEY: str = ""
     OPENAI_MODEL: str = "gpt-3.5-turbo"
     
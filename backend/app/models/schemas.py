@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import Annotated, List, Optional, Dict, Any
 from datetime import datetime
 
 class HealthResponse(BaseModel):
@@ -16,15 +16,71 @@ class UploadResponse(BaseModel):
     filename: str
     file_id: str
     size: int
-    pages: int
-    chunks: int
+    pages: Optional[int] = None  # Known once ingestion finishes
+    chunks: Optional[int] = None
     status: str = "processed"
+    duplicate: bool = False  # True when an identical file was already uploaded
     timestamp: datetime = Field(default_factory=datetime.now)
 
+class JobStatusResponse(BaseModel):
+    """Ingestion job status schema."""
+    file_id: str
+    filename: str
+    operation: str = "ingest"  # "ingest" or "replace"
+    status: str  # "queued", "processing", "done", "failed"
+    size: int = 0
+    pages: Optional[int] = None
+    chunks: Optional[int] = None
+    reused_chunks: Optional[int] = None
+    dedup_ratio: Optional[float] = None  # Share of chunks served from the embedding cache
+    added_chunks: Optional[int] = None  # Chunks embedded and written by this job
+    unchanged_chunks: Optional[int] = None  # Chunks a replace kept from the previous revision
+    removed_chunks: Optional[int] = None  # Chunks a replace deleted
+    error: Optional[str] = None
+    created_at: datetime
+    revised_at: Optional[datetime] = None  # Upload time of the current revision, if the document was replaced
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration_seconds: Optional[float] = None
+
+class DocumentInfo(BaseModel):
+    """Catalog entry for one document."""
+    file_id: str
+    filename: str
+    status: str
+    size: int = 0
+    pages: Optional[int] = None
+    chunks: Optional[int] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+class DocumentListResponse(BaseModel):
+    """Page of the document catalog."""
+    total_documents: int
+    total_chunks: int
+    documents: List[DocumentInfo]
+    next_cursor: Optional[str] = None  # Pass as `cursor` to fetch the next page
+
+class QueryFilters(BaseModel):
+    """Restrict a query to matching chunks; every given condition must hold."""
+    file_ids: Optional[List[str]] = Field(default=None, min_length=1)
+    filenames: Optional[List[str]] = Field(default=None, min_length=1)
+    page_from: Optional[int] = Field(default=None, ge=1)  # Inclusive, 1-based
+    page_to: Optional[int] = Field(default=None, ge=1)  # Inclusive, 1-based
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+
 class QueryRequest(BaseModel):
     """Query request schema."""
     query: str = Field(..., min_length=1, max_length=1000)
     top_k: int = Field(default=3, ge=1, le=10)
+    filters: Optional[QueryFilters] = None
+
+class BatchQueryRequest(BaseModel):
+    """Retrieve sources for many queries in one request, without answers."""
+    queries: List[Annotated[str, Field(min_length=1, max_length=1000)]] = Field(..., min_length=1, max_length=1000)
+    top_k: int = Field(default=3, ge=1, le=10)
+    filters: Optional[QueryFilters] = None  # Applied to every query
 
 class SourceDocument(BaseModel):
     """Source document schema."""
@@ -43,11 +99,22 @@ class QueryResponse(BaseModel):
     processing_time: float
     query: str
 
+class BatchQueryResult(BaseModel):
+    """Sources retrieved for one query of a batch."""
+    query: str
+    sources: List[SourceDocument]
+
+class BatchQueryResponse(BaseModel):
+    """Batch query response schema; results are in request order."""
+    results: List[BatchQueryResult]
+    processing_time: float
+
 class StreamingChunk(BaseModel):
     """Streaming response chunk schema."""
-    type: str  # "answer_chunk", "sources", "error"
+    type: str  # "sources", then "answer_chunk"s, then "timings"; or "error"
     content: Optional[str] = None
     sources: Optional[List[SourceDocument]] = None
+    timings: Optional[Dict[str, Any]] = None
     message: Optional[str] = None
 
 class ErrorResponse(BaseModel):
@@ -0,0 +1,89 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingBatcher:
+    """Coalesce concurrent query embeddings into batched encode calls.
+    
+    Requests arriving within `max_wait_ms` of the first pending one (or until
+    `max_batch_size` are pending) are encoded together in the executor and the
+    results are fanned back out to the awaiting callers.
+    """
+    
+    def __init__(self, embed_batch: Callable[[List[str]], List[Any]],
+                 max_batch_size: int = 32, max_wait_ms: float = 3.0,
+                 executor: Optional[Executor] = None):
+        self.embed_batch = embed_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.executor = executor
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+    
+    async def embed(self, text: str) -> Any:
+        """Embed one text as part of the next batch."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        
+        return await future
+    
+    def _flush(self):
+        """Hand the pending requests to a batch task."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Encode a batch off the event loop and resolve its futures."""
+        # Identical texts in one window are encoded once
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        
+        try:
+            embeddings = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.embed_batch, texts
+            )
+        except Exception as e:
+            logger.error(f"Error embedding query batch: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        
+        by_text = dict(zip(texts, embeddings))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Batching counters."""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000
+        }
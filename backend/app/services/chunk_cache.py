@@ -0,0 +1,68 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+import logging
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH = 500
+
+def chunk_hash(text: str, model_name: str) -> str:
+    """Hash of the whitespace-normalized chunk text and embedding model."""
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+class ChunkEmbeddingCache:
+    """Persistent cache of chunk embeddings keyed by content hash."""
+    
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or settings.CHUNK_CACHE_PATH
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, embedding BLOB NOT NULL)"
+            )
+        logger.info(f"Opened chunk embedding cache: {self.db_path}")
+    
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Look up embeddings for the given hashes; missing keys are omitted."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                placeholders = ", ".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})", batch
+                )
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+    
+    def put_many(self, items: Dict[str, np.ndarray]):
+        """Store embeddings by hash."""
+        if not items:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, embedding) VALUES (?, ?)",
+                [(key, np.asarray(value, dtype=np.float32).tobytes()) for key, value in items.items()]
+            )
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Cache size."""
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return {"entries": count}
@@ -0,0 +1,95 @@
+import re
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fallback tokenization: words and individual punctuation marks, each with the
+# whitespace before it so that consecutive matches cover the text without gaps
+_TOKEN_RE = re.compile(r"(\s*)(\w+|[^\w\s])")
+
+# Approximate characters per subword token for the fallback tokenizer; WordPiece
+# splits long words into several tokens, so counting words alone would undercount
+_CHARS_PER_TOKEN = 4
+
+_tokenizers: Dict[str, object] = {}
+_tokenizers_lock = threading.Lock()
+
+def _load_tokenizer(name: str):
+    """Fast HuggingFace tokenizer for a model, or None when unavailable."""
+    with _tokenizers_lock:
+        if name not in _tokenizers:
+            try:
+                from transformers import AutoTokenizer
+                tokenizer = AutoTokenizer.from_pretrained(name, use_fast=True)
+                if not tokenizer.is_fast:
+                    raise ValueError("no fast tokenizer with offset mapping")
+                logger.info(f"Loaded tokenizer for chunking: {name}")
+            except Exception as e:
+                logger.warning(f"Tokenizer for {name} unavailable ({e}); approximating token counts")
+                tokenizer = None
+            _tokenizers[name] = tokenizer
+        return _tokenizers[name]
+
+class TokenChunker:
+    """Split text into chunks measured in embedding-model tokens."""
+    
+    def __init__(self, chunk_tokens: int = 250, chunk_overlap: int = 50,
+                 tokenizer_name: Optional[str] = None):
+        if not 0 <= chunk_overlap < chunk_tokens:
+            raise ValueError("chunk_overlap must be smaller than chunk_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        self.tokenizer = _load_tokenizer(tokenizer_name) if tokenizer_name else None
+    
+    def tokenize(self, texts: List[str]) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Token (starts, ends, counts) arrays for each text, tokenized in one call."""
+        if self.tokenizer is not None:
+            encoded = self.tokenizer(texts, add_special_tokens=False,
+                                     return_offsets_mapping=True, verbose=False)
+            result = []
+            for offsets in encoded["offset_mapping"]:
+                spans = np.asarray(offsets, dtype=np.int64).reshape(-1, 2)
+                result.append((spans[:, 0], spans[:, 1], np.ones(len(spans), dtype=np.int64)))
+            return result
+        
+        result = []
+        for text in texts:
+            pairs = _TOKEN_RE.findall(text)
+            gaps = np.fromiter(map(len, (gap for gap, _ in pairs)), dtype=np.int64, count=len(pairs))
+            lengths = np.fromiter(map(len, (token for _, token in pairs)), dtype=np.int64, count=len(pairs))
+            ends = np.cumsum(gaps + lengths)
+            counts = (lengths + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+            result.append((ends - lengths, ends, counts))
+        return result
+    
+    def windows(self, counts: np.ndarray) -> List[Tuple[int, int]]:
+        """Token index ranges [i, j) of at most chunk_tokens, overlapping by chunk_overlap."""
+        total = np.concatenate(([0], np.cumsum(counts)))
+        n = len(counts)
+        windows = []
+        start = 0
+        while start < n:
+            # Furthest end whose token total fits; always take at least one token
+            end = int(np.searchsorted(total, total[start] + self.chunk_tokens, side="right")) - 1
+            end = max(end, start + 1)
+            windows.append((start, end))
+            if end >= n:
+                break
+            # Step back so the next chunk repeats about chunk_overlap tokens
+            next_start = int(np.searchsorted(total, total[end] - self.chunk_overlap, side="left"))
+            start = max(next_start, start + 1)
+        return windows
+    
+    def split_many(self, texts: List[str]) -> List[List[Tuple[int, int]]]:
+        """Character spans (start, end) of the chunks of each text."""
+        spans = []
+        for starts, ends, counts in self.tokenize(texts):
+            spans.append([(int(starts[i]), int(ends[j - 1])) for i, j in self.windows(counts)])
+        return spans
+    
+    def split(self, text: str) -> List[Tuple[int, int]]:
+        """Character spans (start, end) of the chunks of a text."""
+        return self.split_many([text])[0]
@@ -35,6 +35,15 @@ class HuggingFaceEmbedder(Embeddings):
         except Exception as e:
             logger.error(f"Error embedding query: {e}")
             raise
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as a float32 array of shape (len(texts), dim)."""
+        try:
+            embeddings = self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+            return embeddings.astype(np.float32, copy=False)
+        except Exception as e:
+            logger.error(f"Error embedding documents: {e}")
+            raise
 
 class OpenAIEmbedder(Embeddings):
     """OpenAI embeddings."""
@@ -64,6 +73,10 @@ class OpenAIEmbedder(Embeddings):
     def embed_query(self, text: str) -> List[float]:
         """Embed a single query."""
         return self.embed_documents([text])[0]
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as a float32 array of shape (len(texts), dim)."""
+        return np.asarray(self.embed_documents(texts), dtype=np.float32)
 
 def get_embedder(embedding_model: str, openai_api_key: str = ""):
     """Factory function to get embedder."""
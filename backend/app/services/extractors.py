@@ -0,0 +1,145 @@
+import os
+import threading
+from typing import Dict, Iterator, Optional, Type
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PDFExtractor:
+    """Base class for PDF text extraction backends."""
+    
+    name = ""
+    
+    def count_pages(self, file_path: str) -> int:
+        """Number of pages in a PDF file."""
+        raise NotImplementedError
+    
+    def iter_page_texts(self, file_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        """Yield the text of pages [start, stop) of a PDF file."""
+        raise NotImplementedError
+
+class PyPDF2Extractor(PDFExtractor):
+    """Pure-Python extraction with PyPDF2; always available."""
+    
+    name = "pypdf2"
+    
+    def __init__(self):
+        import PyPDF2
+        self._pypdf2 = PyPDF2
+    
+    def count_pages(self, file_path: str) -> int:
+        with open(file_path, 'rb') as file:
+            return len(self._pypdf2.PdfReader(file).pages)
+    
+    def iter_page_texts(self, file_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        with open(file_path, 'rb') as file:
+            pdf_reader = self._pypdf2.PdfReader(file)
+            stop = len(pdf_reader.pages) if stop is None else stop
+            for page_num in range(start, stop):
+                yield pdf_reader.pages[page_num].extract_text() or ""
+
+class PyMuPDFExtractor(PDFExtractor):
+    """Extraction with PyMuPDF (MuPDF bindings)."""
+    
+    name = "pymupdf"
+    
+    def __init__(self):
+        try:
+            import pymupdf as fitz
+        except ImportError:
+            # Releases before 1.24 only ship the "fitz" module name
+            import fitz
+        self._fitz = fitz
+    
+    def count_pages(self, file_path: str) -> int:
+        with self._fitz.open(file_path) as doc:
+            return doc.page_count
+    
+    def iter_page_texts(self, file_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        with self._fitz.open(file_path) as doc:
+            stop = doc.page_count if stop is None else stop
+            for page_num in range(start, stop):
+                yield doc.load_page(page_num).get_text() or ""
+
+class PdfiumExtractor(PDFExtractor):
+    """Extraction with pypdfium2 (PDFium bindings)."""
+    
+    name = "pypdfium2"
+    
+    # PDFium is not thread-safe; threads in one process take turns
+    _lock = threading.Lock()
+    
+    def __init__(self):
+        import pypdfium2
+        self._pdfium = pypdfium2
+    
+    def count_pages(self, file_path: str) -> int:
+        with self._lock:
+            pdf = self._pdfium.PdfDocument(file_path)
+            try:
+                return len(pdf)
+            finally:
+                pdf.close()
+    
+    @classmethod
+    def _reset_lock(cls):
+        """Give a forked child its own lock; one held by another parent thread would never be released."""
+        cls._lock = threading.Lock()
+    
+    def iter_page_texts(self, file_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        with self._lock:
+            pdf = self._pdfium.PdfDocument(file_path)
+            stop = len(pdf) if stop is None else stop
+        try:
+            for page_num in range(start, stop):
+                with self._lock:
+                    page = pdf[page_num]
+                    textpage = page.get_textpage()
+                    text = textpage.get_text_range()
+                    textpage.close()
+                    page.close()
+                yield text
+        finally:
+            with self._lock:
+                pdf.close()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=PdfiumExtractor._reset_lock)
+
+# Available backends; "auto" picks the first one that is installed
+EXTRACTORS: Dict[str, Type[PDFExtractor]] = {
+    "pypdfium2": PdfiumExtractor,
+    "pymupdf": PyMuPDFExtractor,
+    "pypdf2": PyPDF2Extractor,
+}
+
+_extractors: Dict[str, PDFExtractor] = {}
+
+def get_extractor(name: str = "auto") -> PDFExtractor:
+    """Factory function to get a PDF extractor by name."""
+    name = name.lower()
+    if name in _extractors:
+        return _extractors[name]
+    
+    if name == "auto":
+        for backend, extractor_class in EXTRACTORS.items():
+            try:
+                extractor = extractor_class()
+            except ImportError:
+                continue
+            logger.info(f"Using PDF extractor: {backend}")
+            _extractors[name] = _extractors[backend] = extractor
+            return extractor
+    
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown PDF extractor: {name} (choose from auto, {', '.join(EXTRACTORS)})")
+    
+    try:
+        extractor = EXTRACTORS[name]()
+    except ImportError:
+        package = "PyPDF2" if name == "pypdf2" else name
+        logger.error(f"PDF extractor {name} is not installed. Install with: pip install {package}")
+        raise
+    logger.info(f"Using PDF extractor: {name}")
+    _extractors[name] = extractor
+    return extractor
@@ -0,0 +1,131 @@
+import asyncio
+import random
+from typing import AsyncIterator, Dict, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+def build_prompt(query: str, context: str) -> str:
+    """Prompt asking an LLM to answer the query from the retrieved context."""
+    return f"""Based on the following context, answer the question.
+
+Question: {query}
+
+Context:
+{context}
+
+Answer: """
+
+class AnswerGenerator:
+    """Streams an answer as text pieces, each forwarded to the client as soon as it is produced."""
+
+    name = "base"
+
+    async def stream(self, query: str, context: str) -> AsyncIterator[str]:
+        """Yield the answer to `query` piece by piece."""
+        raise NotImplementedError
+        yield
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Generator settings."""
+        return {"generator": self.name}
+
+class TemplateGenerator(AnswerGenerator):
+    """Canned answer naming the query, for running without an LLM."""
+
+    name = "template"
+
+    TEMPLATES = [
+        "Based on the documents you've uploaded, here's what I found about '{query}':\n\nThe documents discuss various aspects of this topic, particularly focusing on implementation details and best practices.",
+        "From the analyzed documents regarding '{query}':\n\nKey findings include important considerations for implementation and several recommendations for optimal performance.",
+        "Regarding your question about '{query}', the documents indicate:\n\nSeveral approaches are discussed, with emphasis on practical applications and potential challenges."
+    ]
+
+    async def stream(self, query: str, context: str) -> AsyncIterator[str]:
+        """Yield the whole answer at once; there is nothing to wait for."""
+        yield (random.choice(self.TEMPLATES).format(query=query)
+               + "\n\nThis answer is generated based on semantic search results from your uploaded documents.")
+
+class OpenAIGenerator(AnswerGenerator):
+    """OpenAI chat completions, streamed token by token."""
+
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo"):
+        try:
+            import openai
+            self.client = openai.AsyncOpenAI(api_key=api_key)
+            self.model = model
+            logger.info(f"Loaded OpenAI generation model: {model}")
+        except ImportError:
+            logger.error("openai not installed. Install with: pip install openai")
+            raise
+
+    async def stream(self, query: str, context: str) -> AsyncIterator[str]:
+        """Yield each content delta of a streamed completion."""
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": build_prompt(query, context)}],
+                stream=True
+            )
+        except Exception as e:
+            logger.error(f"Error generating answer with OpenAI: {e}")
+            raise
+        try:
+            async for event in response:
+                if event.choices and event.choices[0].delta.content:
+                    yield event.choices[0].delta.content
+        finally:
+            # Stop the upstream request if the client went away mid-answer
+            await response.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Generator settings."""
+        return {"generator": self.name, "model": self.model}
+
+class StubGenerator(AnswerGenerator):
+    """Local stand-in for a streaming LLM, for measuring the serving path.
+
+    Waits `first_token_ms`, then yields `tokens` words of an answer built
+    from the query, `token_ms` apart, like a model that takes that long to
+    produce its first and each following token.
+    """
+
+    name = "stub"
+
+    def __init__(self, first_token_ms: float = 0.0, token_ms: float = 0.0, tokens: int = 50):
+        self.first_token = max(0.0, first_token_ms) / 1000
+        self.token_delay = max(0.0, token_ms) / 1000
+        self.tokens = tokens
+
+    async def stream(self, query: str, context: str) -> AsyncIterator[str]:
+        """Yield the stub answer a word at a time."""
+        words = f"Stub answer to: {query}".split()
+        await asyncio.sleep(self.first_token)
+        for i in range(self.tokens):
+            if i and self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield ("" if i == 0 else " ") + words[i % len(words)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Generator settings."""
+        return {
+            "generator": self.name,
+            "first_token_ms": self.first_token * 1000,
+            "token_ms": self.token_delay * 1000,
+            "tokens": self.tokens
+        }
+
+def get_generator(generator: str = "template", openai_api_key: str = "", model: str = "gpt-3.5-turbo") -> AnswerGenerator:
+    """Factory function to get the answer generator."""
+    generator = generator.lower()
+    if generator == "openai":
+        if not openai_api_key:
+            raise ValueError("OpenAI API key required for OpenAI generation")
+        return OpenAIGenerator(api_key=openai_api_key, model=model)
+    if generator == "stub":
+        return StubGenerator()
+    if generator != "template":
+        raise ValueError(f"Unknown generator: {generator} (choose from template, openai, stub)")
+    return TemplateGenerator()
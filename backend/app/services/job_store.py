@@ -0,0 +1,329 @@
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, run a single process
+    fcntl = None
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_PROCESSING = "processing"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+JOB_INGEST = "ingest"
+JOB_REPLACE = "replace"  # New revision of an existing document, diffed against its stored chunks
+
+class JobStore:
+    """Persistent ingestion job table backed by SQLite.
+    
+    Doubles as the document catalog: one job row per document, plus a
+    chunks table recording the vector store IDs written for each document.
+    A replace job updates the document's row in place: the new revision
+    waits in the pending_* columns and only replaces the stored one once
+    it is ingested.
+    
+    Several processes (e.g. uvicorn workers) can share the database. Each
+    job records the process whose in-memory queue holds it, and every
+    process holds a lock file for as long as it runs, so on startup a
+    process only takes over jobs whose owner has exited.
+    """
+    
+    # Column definitions; columns missing from an older database are added on startup
+    COLUMNS = [
+        ("file_id", "TEXT PRIMARY KEY"),
+        ("filename", "TEXT NOT NULL"),
+        ("file_path", "TEXT NOT NULL"),
+        ("size", "INTEGER NOT NULL DEFAULT 0"),
+        ("content_hash", "TEXT"),  # SHA-256 of the uploaded bytes
+        ("operation", f"TEXT NOT NULL DEFAULT '{JOB_INGEST}'"),
+        ("status", "TEXT NOT NULL"),
+        ("pages", "INTEGER"),
+        ("chunks", "INTEGER"),
+        ("reused_chunks", "INTEGER"),  # Chunks whose embedding came from the chunk cache
+        ("added_chunks", "INTEGER"),  # Chunks written by this job
+        ("unchanged_chunks", "INTEGER"),  # Chunks a replace kept from the previous revision
+        ("removed_chunks", "INTEGER"),  # Chunks a replace deleted from the previous revision
+        ("error", "TEXT"),
+        ("created_at", "TEXT NOT NULL"),
+        ("started_at", "TEXT"),
+        ("finished_at", "TEXT"),
+        ("duration_seconds", "REAL"),
+        ("revised_at", "TEXT"),  # Upload time of the stored revision, once a replace succeeded
+        ("pending_filename", "TEXT"),  # Revision a replace job is ingesting
+        ("pending_file_path", "TEXT"),
+        ("pending_size", "INTEGER"),
+        ("pending_content_hash", "TEXT"),
+        ("pending_uploaded_at", "TEXT"),
+        ("previous_status", "TEXT"),  # Status restored if the replace fails
+        ("owner", "TEXT"),  # Process that queued the job; see claim_pending_jobs
+    ]
+    
+    # Assignments forgetting a replace job's pending revision
+    _CLEAR_PENDING = (
+        "pending_filename = NULL, pending_file_path = NULL, pending_size = NULL, "
+        "pending_content_hash = NULL, pending_uploaded_at = NULL, previous_status = NULL"
+    )
+    
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or settings.JOB_STORE_PATH
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+        
+        # Held for the life of the process: a lockable owner file means its process is gone
+        self.owner = uuid.uuid4().hex
+        self._owners_dir = f"{self.db_path}.owners"
+        os.makedirs(self._owners_dir, exist_ok=True)
+        self._owner_file = open(os.path.join(self._owners_dir, self.owner), "w")
+        if fcntl is not None:
+            fcntl.flock(self._owner_file, fcntl.LOCK_EX)
+        self._replay_lock_file = open(f"{self.db_path}.replay.lock", "a")
+        logger.info(f"Opened ingestion job store: {self.db_path}")
+    
+    def _create_tables(self):
+        """Create the jobs table and add any columns missing from older versions."""
+        with self._lock, self._conn:
+            columns = ", ".join(f"{name} {definition}" for name, definition in self.COLUMNS)
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS jobs ({columns})")
+            existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for name, definition in self.COLUMNS:
+                if name not in existing:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_content_hash ON jobs (content_hash)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "chunk_id TEXT PRIMARY KEY, file_id TEXT NOT NULL, content_hash TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_file_id ON chunks (file_id)")
+    
+    def _execute(self, sql: str, params: tuple = ()):
+        """Execute a write statement in its own transaction."""
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params)
+    
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        """Run a read query and return rows as dicts."""
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+    
+    @contextmanager
+    def exclusive(self):
+        """Serialize startup replay across processes sharing the database."""
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._replay_lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._replay_lock_file, fcntl.LOCK_UN)
+    
+    def _owner_alive(self, owner: Optional[str]) -> bool:
+        """Whether the process that queued a job is still running."""
+        if owner is None or fcntl is None:
+            return owner == self.owner
+        if owner == self.owner:
+            return True
+        try:
+            with open(os.path.join(self._owners_dir, owner), "r") as f:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except FileNotFoundError:
+            return False
+        except BlockingIOError:
+            return True
+        return False
+    
+    def claim_pending_jobs(self) -> List[Dict[str, Any]]:
+        """Take over queued or in-progress jobs whose owning process has exited, oldest first.
+        
+        Call under exclusive(). Each job is claimed with a conditional
+        update, so no two processes replay the same job.
+        """
+        claimed = []
+        for job in self.pending_jobs():
+            if self._owner_alive(job["owner"]):
+                continue
+            cursor = self._execute(
+                "UPDATE jobs SET owner = ? WHERE file_id = ? AND owner IS ?",
+                (self.owner, job["file_id"], job["owner"])
+            )
+            if cursor.rowcount == 1:
+                claimed.append(job)
+        
+        # Owner files of exited processes
+        for owner in os.listdir(self._owners_dir):
+            if not self._owner_alive(owner):
+                try:
+                    os.remove(os.path.join(self._owners_dir, owner))
+                except FileNotFoundError:
+                    pass
+        return claimed
+    
+    def create_job(self, file_id: str, filename: str, file_path: str, size: int = 0,
+                   content_hash: Optional[str] = None, operation: str = JOB_INGEST) -> bool:
+        """Record a newly queued upload; False if the file already has a job, e.g. one adopted at startup."""
+        cursor = self._execute(
+            "INSERT OR IGNORE INTO jobs (file_id, filename, file_path, size, content_hash, operation, "
+            "status, created_at, owner) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (file_id, filename, file_path, size, content_hash, operation, JOB_QUEUED,
+             datetime.now().isoformat(), self.owner)
+        )
+        return cursor.rowcount == 1
+    
+    def start_replace(self, file_id: str, filename: str, file_path: str, size: int = 0,
+                      content_hash: Optional[str] = None):
+        """Queue a new revision of an existing document, keeping its row, position and stored revision."""
+        self._execute(
+            "UPDATE jobs SET operation = ?, previous_status = status, status = ?, pending_filename = ?, "
+            "pending_file_path = ?, pending_size = ?, pending_content_hash = ?, pending_uploaded_at = ?, "
+            "error = NULL, started_at = NULL, owner = ? WHERE file_id = ?",
+            (JOB_REPLACE, JOB_QUEUED, filename, file_path, size, content_hash, datetime.now().isoformat(),
+             self.owner, file_id)
+        )
+    
+    def cancel_replace(self, file_id: str):
+        """Drop a queued revision, restoring the document's previous status."""
+        self._execute(
+            f"UPDATE jobs SET status = previous_status, {self._CLEAR_PENDING} WHERE file_id = ?",
+            (file_id,)
+        )
+    
+    def delete_job(self, file_id: str):
+        """Remove a job record."""
+        self._execute("DELETE FROM jobs WHERE file_id = ?", (file_id,))
+    
+    def delete_document(self, file_id: str):
+        """Remove a document's job record and chunk IDs."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks WHERE file_id = ?", (file_id,))
+            self._conn.execute("DELETE FROM jobs WHERE file_id = ?", (file_id,))
+    
+    def add_chunks(self, file_id: str, chunk_ids: List[str], content_hashes: List[Optional[str]]):
+        """Record chunk IDs written to the vector store for a document."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, file_id, content_hash) VALUES (?, ?, ?)",
+                [(chunk_id, file_id, content_hash) for chunk_id, content_hash in zip(chunk_ids, content_hashes)]
+            )
+    
+    def remove_chunks(self, chunk_ids: List[str]):
+        """Forget chunk IDs deleted from the vector store."""
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+    
+    def clear_chunks(self, file_id: str):
+        """Forget all chunk IDs of a document."""
+        self._execute("DELETE FROM chunks WHERE file_id = ?", (file_id,))
+    
+    def get_chunk_hashes(self, file_id: str) -> Dict[str, Optional[str]]:
+        """Map each recorded chunk ID of a document to its content hash."""
+        rows = self._query("SELECT chunk_id, content_hash FROM chunks WHERE file_id = ?", (file_id,))
+        return {row["chunk_id"]: row["content_hash"] for row in rows}
+    
+    def all_chunk_ids(self) -> List[str]:
+        """Every recorded chunk ID."""
+        return [row["chunk_id"] for row in self._query("SELECT chunk_id FROM chunks")]
+    
+    def mark_queued(self, file_id: str):
+        """Reset a job to queued, e.g. when it is replayed after a restart."""
+        self._execute(
+            "UPDATE jobs SET status = ?, started_at = NULL, error = NULL WHERE file_id = ?",
+            (JOB_QUEUED, file_id)
+        )
+    
+    def mark_processing(self, file_id: str):
+        """Record that a worker picked up the job."""
+        self._execute(
+            "UPDATE jobs SET status = ?, started_at = ? WHERE file_id = ?",
+            (JOB_PROCESSING, datetime.now().isoformat(), file_id)
+        )
+    
+    def mark_done(self, file_id: str, pages: int, chunks: int, duration: float,
+                  reused_chunks: int = 0, added_chunks: Optional[int] = None,
+                  unchanged_chunks: int = 0, removed_chunks: int = 0):
+        """Record a successfully ingested file; a replaced document adopts its pending revision."""
+        if added_chunks is None:
+            added_chunks = chunks
+        self._execute(
+            "UPDATE jobs SET status = ?, pages = ?, chunks = ?, reused_chunks = ?, added_chunks = ?, "
+            "unchanged_chunks = ?, removed_chunks = ?, error = NULL, finished_at = ?, "
+            "duration_seconds = ?, filename = COALESCE(pending_filename, filename), "
+            "file_path = COALESCE(pending_file_path, file_path), size = COALESCE(pending_size, size), "
+            "content_hash = COALESCE(pending_content_hash, content_hash), "
+            f"revised_at = COALESCE(pending_uploaded_at, revised_at), {self._CLEAR_PENDING} WHERE file_id = ?",
+            (JOB_DONE, pages, chunks, reused_chunks, added_chunks, unchanged_chunks, removed_chunks,
+             datetime.now().isoformat(), duration, file_id)
+        )
+    
+    def mark_failed(self, file_id: str, error: str, duration: Optional[float] = None):
+        """Record a failed ingestion; a failed replace keeps the stored revision and its status."""
+        self._execute(
+            "UPDATE jobs SET status = COALESCE(previous_status, ?), error = ?, finished_at = ?, "
+            f"duration_seconds = ?, {self._CLEAR_PENDING} WHERE file_id = ?",
+            (JOB_FAILED, error, datetime.now().isoformat(), duration, file_id)
+        )
+    
+    def get_job(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job by file ID."""
+        rows = self._query("SELECT * FROM jobs WHERE file_id = ?", (file_id,))
+        return rows[0] if rows else None
+    
+    def find_by_content_hash(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Most recent job for identical file contents that has not failed."""
+        rows = self._query(
+            "SELECT * FROM jobs WHERE content_hash = ? AND status != ? "
+            "ORDER BY created_at DESC LIMIT 1",
+            (content_hash, JOB_FAILED)
+        )
+        return rows[0] if rows else None
+    
+    def pending_jobs(self) -> List[Dict[str, Any]]:
+        """Jobs that were queued or in progress, oldest first."""
+        return self._query(
+            "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+            (JOB_QUEUED, JOB_PROCESSING)
+        )
+    
+    def list_documents(self, limit: int = 50, cursor: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """One page of documents in insertion order, and the cursor of the next page (None at the end)."""
+        rows = self._query(
+            "SELECT rowid, * FROM jobs WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (cursor or 0, limit + 1)
+        )
+        next_cursor = rows[limit - 1]["rowid"] if len(rows) > limit else None
+        return rows[:limit], next_cursor
+    
+    def count_documents(self, status: Optional[str] = None) -> int:
+        """Number of documents, optionally with a given job status."""
+        if status is None:
+            rows = self._query("SELECT COUNT(*) AS count FROM jobs")
+        else:
+            rows = self._query("SELECT COUNT(*) AS count FROM jobs WHERE status = ?", (status,))
+        return rows[0]["count"]
+    
+    def known_file_ids(self) -> set:
+        """All file IDs with a job record."""
+        return {row["file_id"] for row in self._query("SELECT file_id FROM jobs")}
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Job counts by status."""
+        rows = self._query("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status")
+        return {row["status"]: row["count"] for row in rows}
@@ -0,0 +1,473 @@
+import json
+import math
+import os
+import re
+import shutil
+import threading
+from collections import Counter
+from contextlib import contextmanager
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, run a single writer
+    fcntl = None
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Words, plus identifiers joined by - . / : such as "ERR-4012" or "v2.1.0"
+_TOKEN_RE = re.compile(r"\w+(?:[-./:]\w+)*")
+_SPLIT_RE = re.compile(r"[-./:]")
+
+# Terms are stored as fixed-width UTF-8; longer ones are truncated
+TERM_BYTES = 32
+# Chunk ids are stored fixed-width too, so they can be memory-mapped
+ID_BYTES = 96
+
+_TERM_DTYPE = np.dtype(f"S{TERM_BYTES}")
+_ID_DTYPE = np.dtype(f"S{ID_BYTES}")
+
+# Append-only per-doc files, indexed by doc number
+_DOC_FILES = {"ids": _ID_DTYPE, "lengths": np.dtype(np.int32), "live": np.dtype(np.uint8)}
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms of a text.
+    
+    Compound identifiers are kept whole and also split into their parts, so
+    "ERR-4012" matches both the exact code and a query for "4012".
+    """
+    terms = _TOKEN_RE.findall(text.lower())
+    for token in [token for token in terms if not token.isalnum()]:
+        parts = _SPLIT_RE.split(token)
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+def _encode(terms) -> np.ndarray:
+    return np.array([term.encode("utf-8")[:TERM_BYTES] for term in terms], dtype=_TERM_DTYPE)
+
+class _Segment:
+    """Immutable postings in CSR layout: for the sorted `terms`, the postings
+    of terms[i] are docs/tfs[offsets[i]:offsets[i + 1]]."""
+    
+    FILES = ("terms", "offsets", "docs", "tfs")
+    
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, docs: np.ndarray, tfs: np.ndarray):
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+    
+    @property
+    def postings(self) -> int:
+        return len(self.docs)
+    
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.FILES)
+    
+    @classmethod
+    def build(cls, vocab: np.ndarray, term_ids: np.ndarray, docs: np.ndarray, tfs: np.ndarray) -> "_Segment":
+        """Group (term index into vocab, doc, tf) triples by term, keeping docs ascending within each term."""
+        order = np.lexsort((docs, term_ids))
+        counts = np.bincount(term_ids, minlength=len(vocab))
+        used = counts > 0
+        offsets = np.zeros(int(used.sum()) + 1, dtype=np.int64)
+        np.cumsum(counts[used], out=offsets[1:])
+        return cls(vocab[used], offsets, docs[order].astype(np.int32), tfs[order].astype(np.uint16))
+    
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for name in self.FILES:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+    
+    @classmethod
+    def load(cls, directory: str) -> "_Segment":
+        # Plain arrays over the mappings: memmap slicing is slow for many small lookups
+        return cls(*(np.asarray(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")) for name in cls.FILES))
+    
+    def lookup(self, term: np.ndarray) -> Tuple[int, int]:
+        """Range of one encoded term's postings in docs and tfs (empty if absent)."""
+        i = int(np.searchsorted(self.terms, term))
+        if i == len(self.terms) or self.terms[i] != term:
+            return 0, 0
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+    
+    def triples(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Postings expanded back to (term index, doc, tf)."""
+        term_ids = np.repeat(np.arange(len(self.terms)), np.diff(self.offsets))
+        return term_ids, np.asarray(self.docs), np.asarray(self.tfs)
+
+class BM25Index:
+    """Incremental BM25 keyword index over chunk text.
+    
+    Each add writes one immutable segment of array-backed postings (sorted
+    terms, CSR offsets, int32 doc numbers, uint16 term frequencies), saved as
+    .npy files and memory-mapped. Segments are merged logarithmically, so a
+    query looks up each term in a handful of segments with a binary search.
+    Doc numbers index three append-only files: chunk ids, token counts and
+    one live byte per doc. Deletes clear the live byte in place; merges drop
+    dead postings.
+    
+    A JSON manifest lists the current segments and doc count and is replaced
+    atomically after every change. Writers hold an exclusive file lock, and
+    other processes reload when the manifest revision changes.
+    
+    Common terms are down-weighted by IDF, not dropped. For very large
+    corpora, `max_postings` optionally skips terms found in more chunks
+    than that, bounding a query's cost by its rarer terms rather
+    than by words like "the".
+    """
+    
+    # Merge the two newest segments while the older is less than this many
+    # times larger than the newer
+    MERGE_FACTOR = 4
+    
+    # Multi-term queries matching fewer than 1 / DENSE_RATIO of the docs sum
+    # scores by sorting matches instead of scattering into a per-doc array
+    DENSE_RATIO = 64
+    
+    def __init__(self, path: Optional[str] = None, k1: Optional[float] = None, b: Optional[float] = None,
+                 max_postings: Optional[int] = None):
+        self.path = path or settings.LEXICAL_INDEX_PATH
+        self.k1 = settings.BM25_K1 if k1 is None else k1
+        self.b = settings.BM25_B if b is None else b
+        self.max_postings = settings.BM25_MAX_POSTINGS if max_postings is None else max_postings
+        os.makedirs(os.path.join(self.path, "segments"), exist_ok=True)
+        
+        self._lock = threading.RLock()
+        self._lock_file = open(os.path.join(self.path, "lock"), "a")
+        self._manifest_path = os.path.join(self.path, "manifest.json")
+        self._order: Optional[np.ndarray] = None
+        self._norms: Optional[np.ndarray] = None
+        with self._exclusive():
+            self._load()
+            self._remove_orphans()
+        logger.info(f"Opened BM25 index with {self._live} chunks in {len(self._segments)} segments: {self.path}")
+    
+    @contextmanager
+    def _exclusive(self):
+        """Serialize writers across threads and, where supported, processes."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+    
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+    
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self._manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"revision": 0, "docs": 0, "segments": [], "next_segment": 0}
+    
+    def _write_manifest(self):
+        self._manifest["revision"] += 1
+        tmp = f"{self._manifest_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp, self._manifest_path)
+        self._manifest_mtime = os.stat(self._manifest_path).st_mtime_ns
+    
+    def _map(self, name: str, dtype: np.dtype, count: int, mode: str = "r") -> np.ndarray:
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        mapped = np.memmap(self._file(name), dtype=dtype, mode=mode, shape=(count,))
+        return np.asarray(mapped) if mode == "r" else mapped
+    
+    def _load(self):
+        """(Re)read the manifest and map the segments and doc files it lists."""
+        with self._lock:
+            manifest = self._read_manifest()
+            docs = manifest["docs"]
+            for name, dtype in _DOC_FILES.items():
+                path = self._file(name)
+                open(path, "ab").close()
+                if os.path.getsize(path) < docs * dtype.itemsize:
+                    raise RuntimeError(f"BM25 index file {path} is shorter than its manifest")
+            
+            self._manifest = manifest
+            self._manifest_mtime = os.stat(self._manifest_path).st_mtime_ns if os.path.exists(self._manifest_path) else 0
+            self._segments = [_Segment.load(self._file(os.path.join("segments", name))) for name in manifest["segments"]]
+            self._map_docs()
+            self._order = None
+            self._norms = None
+            alive = self._live_mask.view(bool)
+            self._live = int(np.count_nonzero(alive))
+            self._total_length = int(self._lengths[alive].sum(dtype=np.int64))
+    
+    def _map_docs(self):
+        docs = self._manifest["docs"]
+        self._ids = self._map("ids", _ID_DTYPE, docs)
+        self._lengths = self._map("lengths", np.int32, docs)
+        self._live_mask = self._map("live", np.uint8, docs)
+    
+    def _remove_orphans(self):
+        """Delete segments and doc rows an interrupted add or merge left behind."""
+        current = set(self._manifest["segments"])
+        for name in os.listdir(self._file("segments")):
+            if name not in current:
+                shutil.rmtree(self._file(os.path.join("segments", name)), ignore_errors=True)
+        # Doc files are written before the manifest
+        for name, dtype in _DOC_FILES.items():
+            size = self._manifest["docs"] * dtype.itemsize
+            if os.path.getsize(self._file(name)) > size:
+                os.truncate(self._file(name), size)
+    
+    def _refresh(self):
+        """Reload if another process changed the index."""
+        try:
+            mtime = os.stat(self._manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._manifest_mtime and self._read_manifest()["revision"] != self._manifest["revision"]:
+            self._load()
+    
+    def _append(self, name: str, values: np.ndarray):
+        with open(self._file(name), "r+b") as f:
+            f.seek(self._manifest["docs"] * values.dtype.itemsize)
+            f.write(values.tobytes())
+            f.truncate()
+    
+    def _encode_ids(self, ids: List[str]) -> np.ndarray:
+        return np.array([chunk_id.encode("utf-8") for chunk_id in ids], dtype=_ID_DTYPE)
+    
+    def _id_order(self) -> np.ndarray:
+        """Doc numbers sorted by chunk id, for id lookups; built on first use."""
+        if self._order is None:
+            self._order = np.argsort(self._ids, kind="stable")
+        return self._order
+    
+    def _find(self, keys: np.ndarray) -> np.ndarray:
+        """Live doc numbers of encoded chunk ids, -1 for ids not indexed."""
+        order = self._id_order()
+        if not len(order):
+            return np.full(len(keys), -1, dtype=np.int64)
+        # The rightmost match is the newest doc with that id
+        positions = np.searchsorted(self._ids, keys, side="right", sorter=order) - 1
+        docnos = order[np.maximum(positions, 0)]
+        found = (positions >= 0) & (self._ids[docnos] == keys) & self._live_mask[docnos].view(bool)
+        return np.where(found, docnos, -1)
+    
+    def add(self, ids: List[str], texts: List[str]):
+        """Index chunk texts under their chunk ids; ids already indexed are skipped."""
+        if not ids:
+            return
+        with self._exclusive():
+            self._refresh()
+            keys = self._encode_ids(ids)
+            new = np.zeros(len(keys), dtype=bool)
+            new[np.unique(keys, return_index=True)[1]] = True
+            new &= self._find(keys) < 0
+            keys, texts = keys[new], [text for text, is_new in zip(texts, new) if is_new]
+            if not len(keys):
+                return
+            
+            first = self._manifest["docs"]
+            terms, docs, tfs, lengths = [], [], [], []
+            for docno, text in enumerate(texts, start=first):
+                counts = Counter(tokenize(text))
+                terms.extend(counts.keys())
+                tfs.extend(counts.values())
+                docs.extend([docno] * len(counts))
+                lengths.append(sum(counts.values()))
+            
+            name = None
+            if terms:
+                name = f"seg-{self._manifest['next_segment']:08d}"
+                vocab, term_ids = np.unique(_encode(terms), return_inverse=True)
+                segment = _Segment.build(vocab, term_ids, np.array(docs, dtype=np.int32),
+                                         np.minimum(tfs, np.iinfo(np.uint16).max))
+                segment.save(self._file(os.path.join("segments", name)))
+                self._manifest["segments"].append(name)
+                self._manifest["next_segment"] += 1
+            
+            self._append("ids", keys)
+            self._append("lengths", np.array(lengths, dtype=np.int32))
+            self._append("live", np.ones(len(keys), dtype=np.uint8))
+            self._manifest["docs"] = first + len(keys)
+            self._write_manifest()
+            self._load_appended(first, keys, name)
+            self._merge()
+    
+    def _load_appended(self, first: int, keys: np.ndarray, segment: Optional[str]):
+        """Map what add() just wrote without rereading the whole index."""
+        with self._lock:
+            if segment is not None:
+                self._segments.append(_Segment.load(self._file(os.path.join("segments", segment))))
+            if self._order is not None:
+                # Insert the new docs after existing docs with the same id
+                by_key = np.argsort(keys, kind="stable")
+                positions = np.searchsorted(self._ids, keys[by_key], side="right", sorter=self._order)
+                self._order = np.insert(self._order, positions, first + by_key)
+            self._map_docs()
+            self._norms = None
+            self._live += len(keys)
+            self._total_length += int(self._lengths[first:].sum(dtype=np.int64))
+    
+    def _merge(self):
+        """Merge the newest segments while they are of similar size, dropping dead postings."""
+        while len(self._segments) > 1 and self._segments[-2].postings < self.MERGE_FACTOR * self._segments[-1].postings:
+            older, newer = self._segments[-2:]
+            vocab = np.union1d(older.terms, newer.terms)
+            parts = [segment.triples() for segment in (older, newer)]
+            term_ids = np.concatenate([np.searchsorted(vocab, seg.terms)[ids] for seg, (ids, _, _) in zip((older, newer), parts)])
+            docs = np.concatenate([part[1] for part in parts])
+            tfs = np.concatenate([part[2] for part in parts])
+            alive = self._live_mask[docs].view(bool)
+            merged = _Segment.build(vocab, term_ids[alive], docs[alive], tfs[alive])
+            
+            replaced = self._manifest["segments"][-2:]
+            if merged.postings:
+                name = f"seg-{self._manifest['next_segment']:08d}"
+                merged.save(self._file(os.path.join("segments", name)))
+                self._manifest["segments"][-2:] = [name]
+                self._manifest["next_segment"] += 1
+                merged = [_Segment.load(self._file(os.path.join("segments", name)))]
+            else:
+                del self._manifest["segments"][-2:]
+                merged = []
+            self._write_manifest()
+            with self._lock:
+                self._segments[-2:] = merged
+            # Readers in other processes keep their mappings of the old files
+            for old in replaced:
+                shutil.rmtree(self._file(os.path.join("segments", old)), ignore_errors=True)
+    
+    def delete(self, ids: List[str]):
+        """Remove chunks from the index; ids not indexed are ignored."""
+        if not ids:
+            return
+        with self._exclusive():
+            self._refresh()
+            docnos = np.unique(self._find(self._encode_ids(ids)))
+            docnos = docnos[docnos >= 0]
+            if not len(docnos):
+                return
+            live = self._map("live", np.uint8, self._manifest["docs"], mode="r+")
+            live[docnos] = 0
+            live.flush()
+            del live
+            self._write_manifest()
+            with self._lock:
+                self._norms = None
+                self._live -= len(docnos)
+                self._total_length -= int(self._lengths[docnos].sum(dtype=np.int64))
+    
+    def _length_norms(self) -> np.ndarray:
+        """Per-doc BM25 length normalization k1 * (1 - b + b * length / average length)."""
+        with self._lock:
+            if self._norms is None:
+                average_length = self._total_length / max(self._live, 1)
+                self._norms = (self.k1 * (1 - self.b + self.b * self._lengths / average_length)).astype(np.float32)
+            return self._norms
+    
+    def _idf(self, df: int, count: int) -> float:
+        df = min(df, count)
+        return math.log(1 + (count - df + 0.5) / (df + 0.5))
+    
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """Chunk ids and BM25 scores of the best keyword matches for a query.
+        
+        Terms are scored rarest first. Once the terms left could not lift a
+        doc outside the candidates into the top_k, those terms only add to
+        the candidates' scores, looked up by binary search. So a common term
+        such as "the" costs a few lookups per candidate, not a pass over its
+        postings. Document frequency counts postings of deleted chunks until
+        the next merge drops them.
+        """
+        self._refresh()
+        with self._lock:
+            segments, ids, live, count = self._segments, self._ids, self._live_mask.view(bool), self._live
+        terms = set(tokenize(query))
+        if not terms or count == 0 or top_k <= 0:
+            return []
+        
+        norms = self._length_norms()
+        found = []
+        for term in _encode(terms):
+            ranges = [(segment, *segment.lookup(term)) for segment in segments]
+            postings = sum(stop - start for _, start, stop in ranges)
+            if postings and not (0 < self.max_postings < postings):
+                found.append((self._idf(postings, count), ranges))
+        if not found:
+            return []
+        found.sort(key=lambda term: -term[0])
+        # A term adds less than idf * (k1 + 1) to any doc's score
+        left = np.cumsum([idf * (self.k1 + 1) for idf, _ in found][::-1])[::-1]
+        
+        candidates, scores = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        for i, (idf, ranges) in enumerate(found):
+            if len(candidates) >= top_k:
+                threshold = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+                if left[i] < threshold:
+                    # Only docs already matched can still reach the top_k
+                    keep = scores + left[i] >= threshold
+                    candidates, scores = candidates[keep], scores[keep]
+                    for rest_idf, rest_ranges in found[i:]:
+                        scores += self._score_candidates(candidates, rest_ranges, rest_idf, norms)
+                    break
+            docs = np.concatenate([segment.docs[start:stop] for segment, start, stop in ranges])
+            tfs = np.concatenate([segment.tfs[start:stop] for segment, start, stop in ranges]).astype(np.float32)
+            if count < len(ids):
+                alive = live[docs]
+                docs, tfs = docs[alive], tfs[alive]
+            term_scores = idf * (self.k1 + 1) * tfs / (tfs + norms[docs])
+            if (len(candidates) + len(docs)) * self.DENSE_RATIO < len(ids):
+                candidates, inverse = np.unique(np.concatenate([candidates, docs]), return_inverse=True)
+                scores = np.bincount(inverse, weights=np.concatenate([scores, term_scores])).astype(np.float32)
+            else:
+                # Sum per doc in a dense array; a doc occurs at most once per term
+                totals = np.zeros(len(ids), dtype=np.float32)
+                totals[candidates] = scores
+                totals[docs] += term_scores
+                candidates = np.flatnonzero(totals)
+                scores = totals[candidates]
+        
+        k = min(top_k, len(candidates))
+        if k < len(candidates):
+            best = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[best], scores[best]
+        order = np.lexsort((candidates, -scores))
+        return [(ids[candidates[i]].decode("utf-8"), float(scores[i])) for i in order]
+    
+    def _score_candidates(self, candidates: np.ndarray, ranges: List[Tuple[_Segment, int, int]], idf: float,
+                          norms: np.ndarray) -> np.ndarray:
+        """One term's BM25 contribution to each of the sorted candidate docs."""
+        scores = np.zeros(len(candidates), dtype=np.float32)
+        # Keys of the postings' dtype, or numpy converts all the postings instead
+        keys = candidates.astype(np.int32)
+        for segment, start, stop in ranges:
+            if start == stop:
+                continue
+            docs = segment.docs[start:stop]
+            positions = np.minimum(np.searchsorted(docs, keys), len(docs) - 1)
+            hit = docs[positions] == keys
+            tfs = segment.tfs[start:stop][positions[hit]].astype(np.float32)
+            scores[hit] += idf * (self.k1 + 1) * tfs / (tfs + norms[candidates[hit]])
+        return scores
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics."""
+        self._refresh()
+        with self._lock:
+            postings = sum(segment.postings for segment in self._segments)
+            index_bytes = sum(segment.nbytes for segment in self._segments)
+            index_bytes += self._ids.nbytes + self._lengths.nbytes + self._live_mask.nbytes
+            return {
+                'chunks': self._live,
+                'segments': len(self._segments),
+                'postings': postings,
+                'index_mb': round(index_bytes / 2**20, 1)
+            }
@@ -0,0 +1,778 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple, Union
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, run a single writer
+    fcntl = None
+
+from app.core.config import settings
+from app.services.vector_store import BaseVectorStore
+
+logger = logging.getLogger(__name__)
+
+# Rows per "IN (...)" lookup, below SQLite's bound-parameter limit
+_SQL_BATCH = 900
+
+QUANTIZATIONS = ("none", "float16", "int8")
+
+# Chroma where-clause comparison operators and their SQL
+_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length so dot products are cosine similarities."""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return embeddings / norms
+
+def _quantize(vectors: np.ndarray, quantization: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Search-matrix rows for normalized float32 vectors, plus per-row scales for int8."""
+    if quantization == "float16":
+        return vectors.astype(np.float16), None
+    if quantization == "int8":
+        # Symmetric per-row scale: the largest component maps to +-127
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    return vectors, None
+
+def _grow(array: np.ndarray, used: int, capacity: int) -> np.ndarray:
+    """Copy the first `used` rows of an array into a larger one."""
+    grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:used] = array[:used]
+    return grown
+
+class NumpyVectorStore(BaseVectorStore):
+    """Exact in-process vector search over a float32 matrix.
+    
+    Normalized embeddings are appended to a flat float32 file (one row per
+    chunk, no header) and searched with one matrix-vector product plus
+    argpartition. A second file holds one live byte per row. Chunk text and
+    metadata live in SQLite keyed by row number, together with the format
+    manifest (dimension and file version).
+    
+    With `mmap` set, the files are memory-mapped rather than read: opening
+    the store costs a few system calls whatever its size, and every worker
+    process maps the same page-cache pages instead of holding a private
+    copy. Writers append under an exclusive file lock; other processes pick
+    up their changes on the next search. Deleted rows are masked out and
+    reclaimed by compaction when the store is opened.
+    
+    With `quantization` set to float16 or int8, searches scan a quantized
+    copy of the matrix (2x or 4x smaller) and rescore the best
+    `top_k * rescore_factor` candidates with their float32 vectors, which
+    are then only read (or faulted in) for those rows. The quantized copy is
+    rebuilt when the setting changes, so every process sharing a store must
+    use the same one.
+    """
+    
+    # Compact on open when at least this share of rows is deleted
+    COMPACT_RATIO = 0.25
+    
+    # Quantized rows widened to float32 at a time while scoring
+    SCORE_BLOCK = 16384
+    
+    # Filters matching more than this share of rows scan the whole matrix
+    # instead of gathering the matching rows
+    FILTER_SCAN_RATIO = 0.25
+    
+    # Metadata fields copied into indexed payload columns, so filters on them
+    # are index lookups instead of JSON scans
+    INDEXED_FIELDS = {"file_id": "TEXT", "source": "TEXT", "page": "INTEGER", "uploaded_at": "REAL"}
+    
+    # Rows per add_documents call the write buffer should send
+    max_batch_size = 5000
+    
+    def __init__(self, path: Optional[str] = None, mmap: Optional[bool] = None,
+                 quantization: Optional[str] = None, rescore_factor: Optional[int] = None):
+        super().__init__()
+        self.path = os.path.join(path or settings.VECTOR_STORE_PATH, "numpy")
+        self.mmap = settings.VECTOR_STORE_MMAP if mmap is None else mmap
+        self.quantization = (quantization or settings.VECTOR_QUANTIZATION).lower()
+        if self.quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown vector quantization: {self.quantization} (choose from {', '.join(QUANTIZATIONS)})")
+        self.rescore_factor = max(1, settings.VECTOR_RESCORE_FACTOR if rescore_factor is None else rescore_factor)
+        # File scanned by searches: the float32 matrix or its quantized copy
+        self._search_file = "matrix" if self.quantization == "none" else "codes"
+        os.makedirs(self.path, exist_ok=True)
+        
+        self._lock = threading.RLock()
+        self._lock_file = open(os.path.join(self.path, "lock"), "a")
+        self._conn = sqlite3.connect(os.path.join(self.path, "payload.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+        with self._exclusive():
+            self._open()
+        logger.info(f"Opened NumPy vector store with {self._live_count()} vectors: {self.path}")
+    
+    def _create_tables(self):
+        """Create the payload and manifest tables, adding index columns missing from older stores."""
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rows ("
+                "row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, document TEXT NOT NULL, metadata TEXT NOT NULL)"
+            )
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(rows)")}
+            for field, column_type in self.INDEXED_FIELDS.items():
+                if field not in existing:
+                    self._conn.execute(f"ALTER TABLE rows ADD COLUMN {field} {column_type}")
+                    self._conn.execute(f"UPDATE rows SET {field} = json_extract(metadata, '$.{field}')")
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_rows_{field} ON rows ({field})")
+    
+    @contextmanager
+    def _exclusive(self):
+        """Serialize writers across threads and, where supported, processes."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+    
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def _set_meta(self, key: str, value: Any):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+    
+    def _publish(self):
+        """Commit a change counter once the row files are written; other processes refresh on the commit."""
+        with self._conn:
+            self._set_meta("changes", int(self._get_meta("changes") or 0) + 1)
+    
+    def _paths(self, version: int) -> Dict[str, str]:
+        """Row-aligned files of a file version."""
+        paths = {
+            "matrix": os.path.join(self.path, f"embeddings.{version}.f32"),
+            "live": os.path.join(self.path, f"live.{version}.u8")
+        }
+        if self.quantization != "none":
+            paths["codes"] = os.path.join(self.path, f"embeddings.{version}.{self.quantization}")
+        if self.quantization == "int8":
+            paths["scales"] = os.path.join(self.path, f"scales.{version}.f32")
+        return paths
+    
+    def _layout(self, key: str) -> Tuple[np.dtype, int]:
+        """Value type and values per row of a row-aligned file."""
+        if key == "live":
+            return np.dtype(bool), 1
+        if key == "scales":
+            return np.dtype(np.float32), 1
+        if key == "codes":
+            return np.dtype(np.float16 if self.quantization == "float16" else np.int8), self.dimension
+        return np.dtype(np.float32), self.dimension
+    
+    def _row_bytes(self, key: str) -> int:
+        dtype, width = self._layout(key)
+        return dtype.itemsize * width
+    
+    def _read_manifest(self):
+        dimension = self._get_meta("dimension")
+        self.dimension = int(dimension) if dimension else None
+        self.version = int(self._get_meta("version") or 0)
+        self.paths = self._paths(self.version)
+    
+    def _rows_in(self, key: str) -> int:
+        return os.path.getsize(self.paths[key]) // self._row_bytes(key)
+    
+    def _file_rows(self) -> int:
+        """Rows fully written to disk; a row counts once its live byte exists."""
+        if self.dimension is None or not all(os.path.exists(path) for path in self.paths.values()):
+            return 0
+        return min(self._rows_in(key) for key in self.paths)
+    
+    def _map_file(self, key: str, rows: int, mode: str = "r") -> np.ndarray:
+        dtype, width = self._layout(key)
+        shape = (rows, width) if key in ("matrix", "codes") else (rows,)
+        return np.memmap(self.paths[key], dtype=dtype, mode=mode, shape=shape)
+    
+    def _read_file(self, key: str, start: int, count: int) -> np.ndarray:
+        dtype, width = self._layout(key)
+        values = np.fromfile(self.paths[key], dtype=dtype, count=count * width, offset=start * self._row_bytes(key))
+        return values.reshape(count, width) if key in ("matrix", "codes") else values
+    
+    def _write_file(self, key: str, start: int, values: np.ndarray):
+        """Write rows from `start` on, dropping anything after them."""
+        with open(self.paths[key], "r+b") as f:
+            f.seek(start * self._row_bytes(key))
+            f.write(values.tobytes())
+            f.truncate()
+    
+    def _open(self):
+        """Recover from interrupted writes, compact if worthwhile and map the files. Needs the exclusive lock."""
+        self._read_manifest()
+        
+        # Files left behind by an interrupted compaction or another quantization setting
+        current = set(self.paths.values())
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            if name.startswith(("embeddings.", "live.", "scales.")) and path not in current:
+                os.remove(path)
+        
+        if self.dimension is not None:
+            for path in self.paths.values():
+                open(path, "ab").close()
+            self._quantize_missing()
+        rows = self._file_rows()
+        if self.dimension is not None:
+            # Drop rows written without their live byte
+            for key, path in self.paths.items():
+                with open(path, "ab") as f:
+                    f.truncate(rows * self._row_bytes(key))
+        with self._conn:
+            self._conn.execute("DELETE FROM rows WHERE row >= ?", (rows,))
+        
+        if rows and np.count_nonzero(self._read_file("live", 0, rows)) <= rows * (1 - self.COMPACT_RATIO):
+            self._compact(rows)
+        self._map()
+    
+    def _quantize_missing(self):
+        """Build the quantized copy for rows that lack one, e.g. after switching quantization."""
+        if self.quantization == "none":
+            return
+        rows = min(self._rows_in("matrix"), self._rows_in("live"))
+        done = min(self._rows_in(key) for key in ("codes", "scales") if key in self.paths)
+        if done >= rows:
+            return
+        logger.info(f"Quantizing {rows - done} vectors to {self.quantization}")
+        source = self._map_file("matrix", rows)
+        for start in range(done, rows, 65536):
+            codes, scales = _quantize(np.asarray(source[start:start + 65536]), self.quantization)
+            self._write_file("codes", start, codes)
+            if scales is not None:
+                self._write_file("scales", start, scales)
+        del source
+    
+    def _map(self):
+        """(Re)load the current file version from scratch."""
+        dtype, width = self._layout(self._search_file) if self.dimension else (np.dtype(np.float32), 0)
+        self._rows = 0
+        self._base = np.empty((0, width), dtype=dtype)
+        self._tail = np.empty((0, width), dtype=dtype)
+        self._base_scales = self._tail_scales = np.empty(0, dtype=np.float32) if self.quantization == "int8" else None
+        self._alive = np.zeros(0, dtype=bool)
+        # Float32 vectors for rescoring quantized candidates
+        self._exact = None
+        self._extend(self._file_rows())
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+    
+    def _compact(self, rows: int):
+        """Rewrite the files without deleted rows and renumber payloads."""
+        live = np.fromiter((row for row, in self._conn.execute("SELECT row FROM rows ORDER BY row")), dtype=np.int64)
+        new_paths = self._paths(self.version + 1)
+        for key, path in new_paths.items():
+            with open(path, "wb") as f:
+                if key == "live":
+                    f.write(np.ones(len(live), dtype=bool).tobytes())
+                else:
+                    source = self._map_file(key, rows)
+                    for start in range(0, len(live), 65536):
+                        f.write(np.ascontiguousarray(source[live[start:start + 65536]]).tobytes())
+                    del source
+                f.flush()
+                os.fsync(f.fileno())
+        
+        # Rows move to lower numbers in ascending order, so targets are always free
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE rows SET row = ? WHERE row = ?",
+                ((new, int(old)) for new, old in enumerate(live) if new != old)
+            )
+            self._set_meta("version", self.version + 1)
+        # Processes still mapping the old files keep them until they remap
+        for path in self.paths.values():
+            os.remove(path)
+        
+        logger.info(f"Compacted NumPy vector store from {rows} to {len(live)} rows")
+        self._read_manifest()
+    
+    def _extend(self, rows: int, codes: Optional[np.ndarray] = None, scales: Optional[np.ndarray] = None):
+        """Make rows up to `rows` searchable; `codes` and `scales` are the new search rows if the caller has them."""
+        if rows <= self._rows:
+            return
+        if self.quantization != "none":
+            self._exact = self._map_file("matrix", rows)
+        if self.mmap:
+            # Fresh maps of the grown files; earlier maps stay valid for searches holding them
+            self._base = self._map_file(self._search_file, rows)
+            if self.quantization == "int8":
+                self._base_scales = self._map_file("scales", rows)
+            self._alive = self._map_file("live", rows, mode="r+")
+            self._rows = rows
+            return
+        
+        count = rows - self._rows
+        if codes is None:
+            codes = self._read_file(self._search_file, self._rows, count)
+            if self.quantization == "int8":
+                scales = self._read_file("scales", self._rows, count)
+        live = self._read_file("live", self._rows, count)
+        
+        # Append to the in-memory tail, growing it geometrically
+        used = self._rows - len(self._base)
+        if used + count > len(self._tail):
+            capacity = max(1024, 2 * len(self._tail), used + count)
+            self._tail = _grow(self._tail, used, capacity)
+            if self._tail_scales is not None:
+                self._tail_scales = _grow(self._tail_scales, used, capacity)
+            self._alive = _grow(self._alive, self._rows, len(self._base) + capacity)
+        self._tail[used:used + count] = codes
+        if self._tail_scales is not None:
+            self._tail_scales[used:used + count] = scales
+        self._alive[self._rows:rows] = live
+        self._rows = rows
+    
+    def _refresh(self):
+        """Pick up rows, deletions and compactions committed by other processes."""
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return
+            self._data_version = data_version
+            
+            dimension, version = self.dimension, self.version
+            self._read_manifest()
+            if self.dimension != dimension or self.version != version:
+                self._map()
+            else:
+                self._extend(self._file_rows())
+                if not self.mmap:
+                    self._alive[:self._rows] = self._read_file("live", 0, self._rows)
+            self._bump_generation()
+    
+    def search(self, query_embedding: Union[np.ndarray, List[float]], top_k: int = 3, filter_by: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        """Search for similar documents."""
+        # Before the result cache lookup, so other processes' writes invalidate it
+        self._refresh()
+        return super().search(query_embedding, top_k, filter_by)
+    
+    def search_batch(self, query_embeddings: Union[np.ndarray, List[List[float]]], top_k: int = 3,
+                     filter_by: Optional[Dict] = None) -> List[List[Dict[str, Any]]]:
+        """Search for several queries at once; one result list per query embedding."""
+        self._refresh()
+        return super().search_batch(query_embeddings, top_k, filter_by)
+    
+    def add_documents(self, documents: List[Dict[str, Any]], embeddings: Union[np.ndarray, List[List[float]]],
+                      ids: Optional[List[str]] = None):
+        """Add documents to vector store."""
+        try:
+            if ids is None:
+                ids = [f"doc_{doc['metadata']['chunk_index']}_{doc['metadata']['file_id']}" for doc in documents]
+            if not ids:
+                return
+            vectors = _normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1))
+            codes, scales = _quantize(vectors, self.quantization)
+            
+            with self._exclusive():
+                try:
+                    self._refresh()
+                    if self.dimension is None:
+                        with self._conn:
+                            self._set_meta("dimension", vectors.shape[1])
+                        self._read_manifest()
+                        for path in self.paths.values():
+                            open(path, "ab").close()
+                        self._map()
+                    if vectors.shape[1] != self.dimension:
+                        raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dimension}")
+                    
+                    # Re-added IDs replace their previous row
+                    self._delete_rows(self._rows_for_ids(ids))
+                    
+                    # Vectors, then payloads, then live bytes: readers only see complete rows,
+                    # and only refresh once the final commit says all three are written
+                    start = self._rows
+                    self._write_file("matrix", start, vectors)
+                    if self.quantization != "none":
+                        self._write_file("codes", start, codes)
+                    if scales is not None:
+                        self._write_file("scales", start, scales)
+                    with self._conn:
+                        self._conn.executemany(
+                            f"INSERT INTO rows (row, id, document, metadata, {', '.join(self.INDEXED_FIELDS)}) "
+                            f"VALUES (?, ?, ?, ?{', ?' * len(self.INDEXED_FIELDS)})",
+                            [
+                                (start + i, chunk_id, doc['page_content'], json.dumps(doc['metadata']),
+                                 *self._indexed_values(doc['metadata']))
+                                for i, (chunk_id, doc) in enumerate(zip(ids, documents))
+                            ]
+                        )
+                    self._write_file("live", start, np.ones(len(ids), dtype=bool))
+                    self._publish()
+                    self._extend(start + len(ids), codes, scales)
+                finally:
+                    self._bump_generation()
+            
+            logger.info(f"Added {len(ids)} documents to vector store")
+        
+        except Exception as e:
+            logger.error(f"Error adding documents to vector store: {e}")
+            raise
+    
+    def _score_into(self, matrix: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray, out: np.ndarray):
+        """Dot products of (possibly quantized) rows with the query."""
+        if not len(matrix):
+            return
+        if matrix.dtype == np.float32:
+            np.dot(matrix, query, out=out)
+            return
+        # NumPy has no fast float16/int8 matmul, so rows are widened a block at a time
+        for start in range(0, len(matrix), self.SCORE_BLOCK):
+            stop = start + self.SCORE_BLOCK
+            np.dot(matrix[start:stop].astype(np.float32), query, out=out[start:stop])
+        if scales is not None:
+            out *= scales
+    
+    def _snapshot(self) -> Tuple[List[Tuple[np.ndarray, Optional[np.ndarray]]], np.ndarray, Optional[np.ndarray], int]:
+        """Consistent views for one search: (rows, scales) segments, the live-row mask,
+        the float32 vectors for rescoring (quantized stores) and the file version."""
+        with self._lock:
+            used = self._rows - len(self._base)
+            tail_scales = self._tail_scales[:used] if self._tail_scales is not None else None
+            segments = [(self._base, self._base_scales), (self._tail[:used], tail_scales)]
+            return segments, np.array(self._alive[:self._rows]), self._exact, self.version
+    
+    def _score_all(self, segments: List[Tuple[np.ndarray, Optional[np.ndarray]]], query: np.ndarray) -> np.ndarray:
+        """Similarity of a normalized query to every row (approximate if quantized)."""
+        scores = np.empty(sum(len(matrix) for matrix, _ in segments), dtype=np.float32)
+        offset = 0
+        for matrix, scales in segments:
+            self._score_into(matrix, scales, query, scores[offset:offset + len(matrix)])
+            offset += len(matrix)
+        return scores
+    
+    def _search(self, query_embedding: Union[np.ndarray, List[float]], top_k: int,
+                filter_by: Optional[Dict]) -> List[Dict[str, Any]]:
+        """Top-k by cosine similarity over the live rows."""
+        if self.dimension is None or not self._rows:
+            return []
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))[0]
+        segments, alive, exact, version = self._snapshot()
+        
+        candidates = None
+        if filter_by:
+            candidates = self._filter_rows(filter_by)
+            candidates = candidates[candidates < len(alive)]
+            candidates = candidates[alive[candidates]]
+            if not len(candidates):
+                return []
+        
+        if candidates is not None and len(candidates) < len(alive) * self.FILTER_SCAN_RATIO:
+            # Selective filter: score only the matching rows, exactly
+            if exact is not None:
+                vectors = exact[candidates]
+            else:
+                (base, _), (tail, _) = segments
+                split = np.searchsorted(candidates, len(base))
+                vectors = np.concatenate([base[candidates[:split]], tail[candidates[split:] - len(base)]])
+            candidate_scores = vectors @ query
+        else:
+            scores = self._score_all(segments, query)
+            candidates = np.flatnonzero(alive) if candidates is None else candidates
+            if not len(candidates):
+                return []
+            candidate_scores = scores[candidates]
+            if exact is not None:
+                # Rescore the best approximate candidates with their float32 vectors
+                pool = min(len(candidates), top_k * self.rescore_factor)
+                best = np.argpartition(-candidate_scores, pool - 1)[:pool]
+                candidates = np.sort(candidates[best])
+                candidate_scores = exact[candidates] @ query
+        
+        k = min(top_k, len(candidates))
+        top = np.argpartition(-candidate_scores, k - 1)[:k]
+        top = top[np.argsort(-candidate_scores[top])]
+        results = self._fetch(candidates[top], candidate_scores[top], version)
+        if results is None:
+            # Another process compacted the store mid-search; row numbers changed
+            self._refresh()
+            return self._search(query_embedding, top_k, filter_by)
+        return results
+    
+    def _search_batch(self, query_embeddings: np.ndarray, top_k: int,
+                      filter_by: Optional[Dict]) -> List[List[Dict[str, Any]]]:
+        """Top-k for several queries with a single pass over the matrix."""
+        if self.dimension is None or not self._rows:
+            return [[] for _ in query_embeddings]
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1))
+        segments, alive, exact, version = self._snapshot()
+        
+        mask = alive
+        if filter_by:
+            rows = self._filter_rows(filter_by)
+            rows = rows[rows < len(alive)]
+            rows = rows[alive[rows]]
+            if len(rows) < len(alive) * self.FILTER_SCAN_RATIO:
+                # Selective filter: gathering the matching rows per query is cheaper
+                return [self._search(query, top_k, filter_by) for query in queries]
+            mask = np.zeros(len(alive), dtype=bool)
+            mask[rows] = True
+        
+        pool = top_k * self.rescore_factor if exact is not None else top_k
+        results = []
+        for query, rows, scores in zip(queries, *self._top_rows(segments, mask, queries, pool)):
+            if exact is not None and len(rows):
+                # Rescore the best approximate candidates with their float32 vectors
+                rows = np.sort(rows)
+                scores = exact[rows] @ query
+            top = np.argsort(-scores, kind="stable")[:top_k]
+            fetched = self._fetch(rows[top], scores[top], version)
+            if fetched is None:
+                # Another process compacted the store mid-search; row numbers changed
+                self._refresh()
+                return self._search_batch(query_embeddings, top_k, filter_by)
+            results.append(fetched)
+        return results
+    
+    def _top_rows(self, segments: List[Tuple[np.ndarray, Optional[np.ndarray]]], mask: np.ndarray,
+                  queries: np.ndarray, pool: int) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """Per query, the `pool` best rows allowed by `mask` and their (approximate) scores.
+        
+        Rows are scored a block at a time against all queries in one matrix
+        product, keeping each block's best rows, so the matrix is read once
+        however many queries there are.
+        """
+        found_rows, found_scores = [], []
+        offset = 0
+        for matrix, scales in segments:
+            for start in range(0, len(matrix), self.SCORE_BLOCK):
+                block = matrix[start:start + self.SCORE_BLOCK]
+                rows = np.arange(offset + start, offset + start + len(block))
+                keep = mask[rows]
+                if not keep.any():
+                    continue
+                # Queries x rows, so each query's partition runs over contiguous memory
+                scores = queries @ block.astype(np.float32, copy=False).T
+                if scales is not None:
+                    scores *= scales[start:start + len(block)]
+                if not keep.all():
+                    rows, scores = rows[keep], scores[:, keep]
+                if len(rows) > pool:
+                    best = np.argpartition(scores, len(rows) - pool, axis=1)[:, -pool:]
+                    found_rows.append(rows[best])
+                    found_scores.append(np.take_along_axis(scores, best, axis=1))
+                else:
+                    found_rows.append(np.broadcast_to(rows, scores.shape))
+                    found_scores.append(scores)
+            offset += len(matrix)
+        if not found_rows:
+            return [np.empty(0, dtype=np.int64)] * len(queries), [np.empty(0, dtype=np.float32)] * len(queries)
+        
+        rows, scores = np.concatenate(found_rows, axis=1), np.concatenate(found_scores, axis=1)
+        if rows.shape[1] > pool:
+            best = np.argpartition(scores, rows.shape[1] - pool, axis=1)[:, -pool:]
+            rows, scores = np.take_along_axis(rows, best, axis=1), np.take_along_axis(scores, best, axis=1)
+        return list(rows), list(scores)
+    
+    def _fetch(self, rows: np.ndarray, scores: np.ndarray, version: int) -> Optional[List[Dict[str, Any]]]:
+        """Payloads of the given rows, in the given order; None if the rows were renumbered since `version`."""
+        placeholders = ",".join("?" * len(rows))
+        with self._lock:
+            # One read transaction, so the version check and the rows agree
+            self._conn.execute("BEGIN")
+            try:
+                if int(self._get_meta("version") or 0) != version:
+                    return None
+                payloads = {
+                    row: (chunk_id, document, metadata)
+                    for row, chunk_id, document, metadata in self._conn.execute(
+                        f"SELECT row, id, document, metadata FROM rows WHERE row IN ({placeholders})",
+                        [int(row) for row in rows]
+                    )
+                }
+            finally:
+                self._conn.execute("COMMIT")
+        results = []
+        for row, score in zip(rows, scores):
+            if int(row) not in payloads:
+                continue  # Deleted since the scores were computed
+            chunk_id, document, metadata = payloads[int(row)]
+            results.append({
+                'content': document,
+                'metadata': json.loads(metadata),
+                'score': float(score),
+                'id': chunk_id
+            })
+        return results
+    
+    def _filter_rows(self, filter_by: Dict) -> np.ndarray:
+        """Sorted rows whose metadata matches a Chroma-style where clause."""
+        clauses, params = self._filter_sql(filter_by)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT row FROM rows WHERE {clauses}", params)
+            return np.sort(np.fromiter((row for row, in rows), dtype=np.int64))
+    
+    def _filter_sql(self, filter_by: Dict) -> Tuple[str, List[Any]]:
+        """SQL condition for a where clause: $and/$or of field conditions using
+        $eq, $ne, $gt, $gte, $lt, $lte, $in and $nin."""
+        clauses, params = [], []
+        for key, value in filter_by.items():
+            if key in ("$and", "$or"):
+                parts = [self._filter_sql(condition) for condition in value]
+                joiner = " AND " if key == "$and" else " OR "
+                clauses.append(joiner.join(f"({clause})" for clause, _ in parts) or ("1" if key == "$and" else "0"))
+                for _, part_params in parts:
+                    params.extend(part_params)
+                continue
+            
+            # Indexed fields are columns; anything else is read from the JSON metadata
+            if key in self.INDEXED_FIELDS:
+                column, column_params = key, []
+            else:
+                column, column_params = "json_extract(metadata, ?)", [f'$."{key}"']
+            for operator, operand in (value.items() if isinstance(value, dict) else [("$eq", value)]):
+                if operator in ("$in", "$nin"):
+                    placeholders = ",".join("?" * len(operand))
+                    clauses.append(f"{column} {'IN' if operator == '$in' else 'NOT IN'} ({placeholders})")
+                    params.extend(column_params + list(operand))
+                elif operator in _OPERATORS:
+                    clauses.append(f"{column} {_OPERATORS[operator]} ?")
+                    params.extend(column_params + [operand])
+                else:
+                    raise ValueError(f"Unsupported filter operator on {key}: {operator}")
+        return " AND ".join(f"({clause})" for clause in clauses) or "1", params
+    
+    def _indexed_values(self, metadata: Dict[str, Any]) -> List[Any]:
+        """Values of the indexed payload columns for a chunk's metadata."""
+        return [metadata.get(field) for field in self.INDEXED_FIELDS]
+    
+    def _rows_for_ids(self, ids: List[str]) -> List[int]:
+        """Row numbers of the given chunk IDs that exist."""
+        rows = []
+        for start in range(0, len(ids), _SQL_BATCH):
+            batch = ids[start:start + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows.extend(row for row, in self._conn.execute(f"SELECT row FROM rows WHERE id IN ({placeholders})", batch))
+        return rows
+    
+    def _delete_rows(self, rows: List[int]):
+        """Drop payloads, then mask the rows out of search. Needs the exclusive lock."""
+        if not rows:
+            return
+        with self._conn:
+            self._conn.executemany("DELETE FROM rows WHERE row = ?", [(row,) for row in rows])
+        self._alive[rows] = False
+        if self.mmap:
+            self._alive.flush()
+        else:
+            with open(self.paths["live"], "r+b") as f:
+                for row in sorted(rows):
+                    f.seek(row)
+                    f.write(b"\x00")
+        self._publish()
+    
+    def _search_row_bytes(self) -> int:
+        """Bytes per row scanned by searches (float32 rows read for rescoring aside)."""
+        if self.dimension is None:
+            return 0
+        return self._row_bytes(self._search_file) + (self._row_bytes("scales") if self.quantization == "int8" else 0)
+    
+    def _live_count(self) -> int:
+        return int(np.count_nonzero(self._alive[:self._rows]))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get vector store statistics."""
+        self._refresh()
+        count = self._live_count()
+        return {
+            "documents": count,
+            "chunks": count,
+            "backend": "numpy",
+            "dimension": self.dimension,
+            "deleted_rows": self._rows - count,
+            "mmap": self.mmap,
+            "quantization": self.quantization,
+            "index_mb": round(self._rows * self._search_row_bytes() / 2**20, 1),
+            "file_version": self.version,
+            "generation": self.generation,
+            "result_cache": self.result_cache.get_stats() if self.result_cache is not None else None
+        }
+    
+    def delete_by_file_id(self, file_id: str):
+        """Delete all documents for a specific file."""
+        try:
+            with self._exclusive():
+                self._refresh()
+                rows = [row for row, in self._conn.execute("SELECT row FROM rows WHERE file_id = ?", (file_id,))]
+                if rows:
+                    try:
+                        self._delete_rows(rows)
+                    finally:
+                        self._bump_generation()
+            if rows:
+                logger.info(f"Deleted {len(rows)} documents for file {file_id}")
+        
+        except Exception as e:
+            logger.error(f"Error deleting documents for file {file_id}: {e}")
+            raise
+    
+    def get_chunk_hashes(self, file_id: str) -> Dict[str, Optional[str]]:
+        """Map each stored chunk ID of a file to its content hash (None for chunks stored without one)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, metadata FROM rows WHERE file_id = ?", (file_id,)).fetchall()
+        return {chunk_id: json.loads(metadata).get("content_hash") for chunk_id, metadata in rows}
+    
+    def get_documents(self, ids: List[str], filter_by: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        """Stored chunks with the given IDs that match an optional where clause, in ID order."""
+        clauses, params = self._filter_sql(filter_by) if filter_by else ("1", [])
+        found = {}
+        with self._lock:
+            for start in range(0, len(ids), _SQL_BATCH):
+                batch = ids[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                for chunk_id, document, metadata in self._conn.execute(
+                    f"SELECT id, document, metadata FROM rows WHERE id IN ({placeholders}) AND ({clauses})",
+                    batch + params
+                ):
+                    found[chunk_id] = {'content': document, 'metadata': json.loads(metadata), 'id': chunk_id}
+        return [found[chunk_id] for chunk_id in ids if chunk_id in found]
+    
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Replace the metadata of stored chunks without touching their embeddings."""
+        if not ids:
+            return
+        try:
+            with self._exclusive():
+                try:
+                    with self._conn:
+                        self._conn.executemany(
+                            f"UPDATE rows SET metadata = ?, {', '.join(f'{field} = ?' for field in self.INDEXED_FIELDS)} "
+                            "WHERE id = ?",
+                            [(json.dumps(metadata), *self._indexed_values(metadata), chunk_id)
+                             for chunk_id, metadata in zip(ids, metadatas)]
+                        )
+                finally:
+                    self._bump_generation()
+            logger.info(f"Updated metadata of {len(ids)} documents")
+        
+        except Exception as e:
+            logger.error(f"Error updating document metadata: {e}")
+            raise
+    
+    def delete_ids(self, ids: List[str]):
+        """Delete chunks by ID."""
+        if not ids:
+            return
+        try:
+            with self._exclusive():
+                try:
+                    self._refresh()
+                    self._delete_rows(self._rows_for_ids(ids))
+                finally:
+                    self._bump_generation()
+            logger.info(f"Deleted {len(ids)} documents")
+        
+        except Exception as e:
+            logger.error(f"Error deleting documents: {e}")
+            raise
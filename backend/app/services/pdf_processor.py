@@ -1,66 +1,184 @@
-import PyPDF2
+import multiprocessing
 import os
-from typing import List, Tuple, Optional
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
+from typing import Iterable, Iterator, List, NamedTuple, Tuple, Optional
 import tempfile
 import shutil
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 import logging
 
+from app.services.chunker import TokenChunker
+from app.services.extractors import get_extractor
+
 logger = logging.getLogger(__name__)
 
+# Separator placed between page texts when a document is joined into one string
+PAGE_SEPARATOR = "\n\n"
+
+class PageText(NamedTuple):
+    """Text of one PDF page with its character span in the joined document."""
+    page: int  # 1-based page number
+    text: str
+    start: int
+    end: int
+
+def _extract_page_range(extractor: str, file_path: str, start: int, stop: int) -> List[str]:
+    """Extract a range of pages; runs in an extraction worker process."""
+    return list(get_extractor(extractor).iter_page_texts(file_path, start, stop))
+
+_extract_pool: Optional[ProcessPoolExecutor] = None
+_extract_pool_lock = threading.Lock()
+
+def _get_extract_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool shared by all parallel extractions in this process.
+    
+    Workers are spawned, not forked: the pool starts lazily from an ingest
+    thread, and a fork would copy locks other threads hold at that moment
+    (e.g. the PDFium lock) into the workers, where nothing releases them.
+    """
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            _extract_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _extract_pool
+
+def shutdown_extract_pool():
+    """Stop the page extraction pool, if one was started."""
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is not None:
+            _extract_pool.shutdown(wait=False, cancel_futures=True)
+            _extract_pool = None
+
 class PDFProcessor:
     """Service for processing PDF files."""
     
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    PAGE_BATCH_SIZE = 16
+    
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200,
+                 extract_workers: int = 1, parallel_min_pages: int = 32,
+                 extractor: str = "auto", chunker: str = "characters",
+                 chunk_tokens: int = 250, chunk_token_overlap: int = 50,
+                 tokenizer_name: Optional[str] = None):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        # 0 means one extraction process per CPU
+        self.extract_workers = extract_workers or os.cpu_count() or 1
+        self.parallel_min_pages = parallel_min_pages
+        self.extractor = get_extractor(extractor)
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             length_function=len,
-            separators=["\n\n", "\n", " ", ""]
+            separators=["\n\n", "\n", " ", ""],
+            add_start_index=True
         )
+        # "tokens" sizes chunks in embedding-model tokens instead of characters
+        self.token_chunker = None
+        if chunker == "tokens":
+            self.token_chunker = TokenChunker(
+                chunk_tokens=chunk_tokens,
+                chunk_overlap=chunk_token_overlap,
+                tokenizer_name=tokenizer_name
+            )
+        elif chunker != "characters":
+            raise ValueError(f"Unknown chunker: {chunker}")
     
-    def extract_text_from_pdf(self, file_path: str) -> Tuple[str, int]:
-        """Extract text from PDF file."""
+    def count_pages(self, file_path: str) -> int:
+        """Number of pages in a PDF file."""
+        return self.extractor.count_pages(file_path)
+    
+    def iter_pages(self, file_path: str, page_count: Optional[int] = None) -> Iterator[PageText]:
+        """Yield the text of each page in order.
+        
+        Large documents are split into page ranges that are extracted in a
+        process pool; ranges are yielded back in page order.
+        """
         try:
-            text = ""
-            pages = 0
+            if page_count is None:
+                page_count = self.count_pages(file_path)
             
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                pages = len(pdf_reader.pages)
-                
-                for page_num in range(pages):
-                    page = pdf_reader.pages[page_num]
-                    page_text = page.extract_text()
-                    
-                    if page_text:
-                        text += f"--- Page {page_num + 1} ---\n{page_text}\n\n"
+            if self.extract_workers > 1 and page_count >= self.parallel_min_pages:
+                texts = self._extract_parallel(file_path, page_count)
+            else:
+                texts = self.extractor.iter_page_texts(file_path)
             
-            logger.info(f"Extracted text from {pages} pages")
-            return text, pages
+            offset = 0
+            for page_num, page_text in enumerate(texts, start=1):
+                yield PageText(page_num, page_text, offset, offset + len(page_text))
+                offset += len(page_text) + len(PAGE_SEPARATOR)
             
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {e}")
             raise
     
+    def _extract_parallel(self, file_path: str, page_count: int) -> Iterator[str]:
+        """Extract page ranges in the process pool, yielding page texts in order."""
+        # Several ranges per worker keeps the pool balanced when pages differ in cost
+        range_size = max(1, -(-page_count // (self.extract_workers * 4)))
+        starts = list(range(0, page_count, range_size))
+        stops = [min(start + range_size, page_count) for start in starts]
+        
+        pool = _get_extract_pool(self.extract_workers)
+        for texts in pool.map(_extract_page_range, repeat(self.extractor.name),
+                              repeat(file_path), starts, stops):
+            yield from texts
+    
+    def extract_text_from_pdf(self, file_path: str) -> Tuple[str, int]:
+        """Extract text from PDF file."""
+        pages = list(self.iter_pages(file_path))
+        text = PAGE_SEPARATOR.join(page.text for page in pages)
+        logger.info(f"Extracted text from {len(pages)} pages")
+        return text, len(pages)
+    
+    def iter_chunks(self, pages: Iterable[PageText], filename: str, file_id: str,
+                    page_count: int) -> Iterator[Document]:
+        """Split pages into chunks as they arrive; chunks never span pages."""
+        chunk_index = 0
+        pages = (page for page in pages if page.text.strip())
+        # Pages are split a few at a time so the tokenizer can work in bulk
+        for batch in iter(lambda: list(islice(pages, self.PAGE_BATCH_SIZE)), []):
+            for page, splits in zip(batch, self._split_texts([page.text for page in batch])):
+                for start, content in splits:
+                    start += page.start
+                    yield Document(page_content=content, metadata={
+                        "source": filename,
+                        "file_id": file_id,
+                        "chunk_index": chunk_index,
+                        "page_count": page_count,
+                        "page": page.page,
+                        "start_char": start,
+                        "end_char": start + len(content)
+                    })
+                    chunk_index += 1
+    
+    def _split_texts(self, texts: List[str]) -> List[List[Tuple[int, str]]]:
+        """(offset, text) of each chunk of each text."""
+        if self.token_chunker is not None:
+            return [[(start, text[start:end]) for start, end in spans]
+                    for text, spans in zip(texts, self.token_chunker.split_many(texts))]
+        return [[(doc.metadata["start_index"], doc.page_content)
+                 for doc in self.text_splitter.create_documents([text])]
+                for text in texts]
+    
     def chunk_text(self, text: str, filename: str, file_id: str, page_count: int) -> List[Document]:
         """Split text into chunks."""
         try:
-            # Create LangChain documents
-            docs = self.text_splitter.create_documents([text])
+            splits = self._split_texts([text])[0]
             
             # Add metadata to each chunk
-            for i, doc in enumerate(docs):
-                doc.metadata.update({
+            docs = []
+            for i, (_, content) in enumerate(splits):
+                docs.append(Document(page_content=content, metadata={
                     "source": filename,
                     "file_id": file_id,
                     "chunk_index": i,
-                    "total_chunks": len(docs),
+                    "total_chunks": len(splits),
                     "page_count": page_count
-                })
+                }))
             
             logger.info(f"Created {len(docs)} chunks from text")
             return docs
@@ -72,14 +190,46 @@ class PDFProcessor:
     def process_pdf(self, file_path: str, filename: str, file_id: str) -> Tuple[List[Document], int]:
         """Process PDF file and return chunks."""
         try:
-            # Extract text
-            text, page_count = self.extract_text_from_pdf(file_path)
+            page_count = self.count_pages(file_path)
             
-            # Chunk text
-            chunks = self.chunk_text(text, filename, file_id, page_count)
+            # Extract and chunk page by page
+            pages = self.iter_pages(file_path, page_count)
+            chunks = list(self.iter_chunks(pages, filename, file_id, page_count))
+            for chunk in chunks:
+                chunk.metadata["total_chunks"] = len(chunks)
             
+            logger.info(f"Created {len(chunks)} chunks from {page_count} pages")
             return chunks, page_count
             
         except Exception as e:
             logger.error(f"Error processing PDF {filename}: {e}")
-            raise
\ No newline at end of file
+            raise
+
+
+# Per-process cache so pool workers build their processor only once
+_worker_processors = {}
+
+def process_pdf_file(file_path: str, filename: str, file_id: str,
+                     chunk_size: int = 1000, chunk_overlap: int = 200,
+                     extract_workers: int = 1, parallel_min_pages: int = 32,
+                     extractor: str = "auto", chunker: str = "characters",
+                     chunk_tokens: int = 250, chunk_token_overlap: int = 50,
+                     tokenizer_name: Optional[str] = None) -> Tuple[List[Document], int]:
+    """Process a PDF file; picklable entry point for thread and process pools."""
+    key = (chunk_size, chunk_overlap, extract_workers, parallel_min_pages, extractor,
+           chunker, chunk_tokens, chunk_token_overlap, tokenizer_name)
+    processor = _worker_processors.get(key)
+    if processor is None:
+        processor = PDFProcessor(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            extract_workers=extract_workers,
+            parallel_min_pages=parallel_min_pages,
+            extractor=extractor,
+            chunker=chunker,
+            chunk_tokens=chunk_tokens,
+            chunk_token_overlap=chunk_token_overlap,
+            tokenizer_name=tokenizer_name
+        )
+        _worker_processors[key] = processor
+    return processor.process_pdf(file_path, filename, file_id)
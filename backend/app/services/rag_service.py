@@ -1,98 +1,556 @@
 import asyncio
 import json
-from typing import List, Dict, Any, AsyncGenerator
+import os
+import time
+import uuid
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from collections import defaultdict, deque
+from typing import List, Dict, Any, AsyncGenerator, Optional, Tuple
 import logging
 from datetime import datetime
 
-from app.services.pdf_processor import PDFProcessor
+import numpy as np
+from langchain.schema import Document
+
+from app.services.pdf_processor import process_pdf_file, shutdown_extract_pool
 from app.services.embedder import get_embedder
-from app.services.vector_store import VectorStore
+from app.services.vector_store import get_vector_store
+from app.services.job_store import JobStore, JOB_DONE, JOB_INGEST, JOB_REPLACE
+from app.services.cache import LRUCache
+from app.services.batcher import EmbeddingBatcher
+from app.services.chunk_cache import ChunkEmbeddingCache, chunk_hash
+from app.services.write_buffer import VectorWriteBuffer
+from app.services.lexical_index import BM25Index
+from app.services.reranker import CrossEncoderReranker
+from app.services.generator import get_generator
 from app.core.config import settings
+from app.models.schemas import QueryFilters, SourceDocument
 
 logger = logging.getLogger(__name__)
 
+def _is_uuid(value: str) -> bool:
+    """Whether a string is a UUID, as used for file IDs."""
+    try:
+        uuid.UUID(value)
+        return True
+    except ValueError:
+        return False
+
+def _normalize_query(query: str) -> str:
+    """Collapse whitespace so trivially different queries share a cache entry."""
+    return " ".join(query.split())
+
+def _elapsed_ms(start: float) -> float:
+    """Milliseconds since a time.perf_counter() reading."""
+    return round((time.perf_counter() - start) * 1000, 2)
+
+def _reciprocal_rank_fusion(rankings: List[List[Dict[str, Any]]], top_k: int, k: int) -> List[Dict[str, Any]]:
+    """Merge ranked result lists, scoring each chunk by the sum of 1 / (k + rank) over the lists it is in."""
+    fused = defaultdict(float)
+    results = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, start=1):
+            fused[result['id']] += 1 / (k + rank)
+            results.setdefault(result['id'], result)
+    best = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    return [{**results[chunk_id], 'score': fused[chunk_id]} for chunk_id in best]
+
 class RAGService:
     """Main RAG pipeline service."""
     
     def __init__(self):
-        self.pdf_processor = PDFProcessor(
-            chunk_size=settings.CHUNK_SIZE,
-            chunk_overlap=settings.CHUNK_OVERLAP
-        )
         self.embedder = get_embedder(
             embedding_model=settings.EMBEDDING_MODEL,
             openai_api_key=settings.OPENAI_API_KEY
         )
-        self.vector_store = VectorStore()
-        self.processing_queue = asyncio.Queue()
-        self.is_processing = False
+        self.vector_store = get_vector_store()
+        # Keyword index fused with vector search, so exact identifiers are found
+        self.lexical_index = BM25Index() if settings.HYBRID_SEARCH_ENABLED else None
+        # Optional second stage reordering an over-fetched candidate list
+        self.reranker = (
+            CrossEncoderReranker(settings.RERANK_MODEL, budget_ms=settings.RERANK_BUDGET_MS)
+            if settings.RERANK_ENABLED else None
+        )
+        self.generator = get_generator(settings.GENERATOR, settings.OPENAI_API_KEY, settings.OPENAI_MODEL)
+        # (time to first byte, time to first answer token) of recent queries, in ms
+        self.stream_latency = deque(maxlen=1000)
+        # Coalesces chunk inserts from concurrent ingest jobs into bulk writes
+        self.write_buffer = (
+            VectorWriteBuffer(
+                self.vector_store,
+                batch_size=settings.VECTOR_WRITE_BATCH_SIZE,
+                flush_interval_ms=settings.VECTOR_WRITE_FLUSH_MS,
+                max_pending_rows=settings.VECTOR_WRITE_MAX_PENDING_ROWS
+            )
+            if settings.VECTOR_WRITE_BATCH_SIZE > 0 else None
+        )
+        self.query_embedding_cache = LRUCache(
+            max_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+            ttl=settings.QUERY_EMBEDDING_CACHE_TTL or None
+        )
+        # A single encoder thread lets queries pile up into the next batch while one runs
+        self.query_batcher = EmbeddingBatcher(
+            self.embedder.encode,
+            max_batch_size=settings.QUERY_BATCH_MAX_SIZE,
+            max_wait_ms=settings.QUERY_BATCH_MAX_WAIT_MS,
+            executor=ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-embed")
+        )
+        # Retrieval (vector scan, keyword search, payload lookup) can take a while; one thread
+        # keeps it off the event loop without letting several large batches compete for the CPU
+        self.batch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-batch")
+        self.job_store = JobStore()
+        self.chunk_cache = ChunkEmbeddingCache() if settings.CHUNK_CACHE_ENABLED else None
+        self.processing_queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_MAXSIZE)
+        self.workers: List[asyncio.Task] = []
+        self.worker_stats: Dict[int, Dict[str, Any]] = {}
+        
+        # Blocking ingestion work runs in pools so the event loop stays responsive
+        self.ingest_executor = self._create_ingest_executor()
+        if isinstance(self.ingest_executor, ThreadPoolExecutor):
+            self.store_executor = self.ingest_executor
+        else:
+            # Embedder and vector store live in this process, so they need threads
+            self.store_executor = ThreadPoolExecutor(
+                max_workers=settings.INGEST_WORKERS,
+                thread_name_prefix="ingest-store"
+            )
     
-    async def process_upload_queue(self):
-        """Process files in the upload queue."""
+    def _create_ingest_executor(self) -> Executor:
+        """Create the pool that runs PDF extraction and chunking."""
+        if settings.INGEST_EXECUTOR == "process":
+            return ProcessPoolExecutor(max_workers=settings.INGEST_WORKERS)
+        return ThreadPoolExecutor(
+            max_workers=settings.INGEST_WORKERS,
+            thread_name_prefix="ingest"
+        )
+    
+    def start_workers(self):
+        """Start the ingestion workers."""
+        if self.workers:
+            return
+        for worker_id in range(settings.INGEST_CONCURRENCY):
+            self.worker_stats[worker_id] = {
+                "worker_id": worker_id,
+                "current_file": None,
+                "processed": 0,
+                "failed": 0,
+                "busy_seconds": 0.0,
+                "last_finished_at": None
+            }
+            self.workers.append(asyncio.create_task(self.process_upload_queue(worker_id)))
+        # Snapshot pending work before any new upload can create a job,
+        # so nothing queued after startup is replayed a second time
+        pending = self._collect_pending_jobs()
+        self.workers.append(asyncio.create_task(self.replay_pending_jobs(pending)))
+        if self.lexical_index is not None:
+            self.workers.append(asyncio.create_task(self.backfill_lexical_index()))
+        logger.info(f"Started {settings.INGEST_CONCURRENCY} ingestion workers")
+    
+    def _collect_pending_jobs(self) -> List[Dict[str, Any]]:
+        """Queue items for jobs interrupted by a restart and uploads that never got a job.
+        
+        Every worker process runs this at startup; the job store lock and
+        per-job claims make sure each job is replayed by one process only.
+        """
+        with self.job_store.exclusive():
+            return self._claim_pending_jobs()
+    
+    def _claim_pending_jobs(self) -> List[Dict[str, Any]]:
+        """Claim jobs left by exited processes and adopt orphan uploads; call under the job store lock."""
+        pending = []
+        for job in self.job_store.claim_pending_jobs():
+            # A replace ingests the revision waiting in the pending columns
+            file_path = job["pending_file_path"] or job["file_path"]
+            if not os.path.exists(file_path):
+                self.job_store.mark_failed(job["file_id"], "Uploaded file is missing")
+                continue
+            
+            self.job_store.mark_queued(job["file_id"])
+            pending.append({
+                'file_path': file_path,
+                'filename': job["pending_filename"] or job["filename"],
+                'file_id': job["file_id"],
+                # An interrupted ingest may have written some chunks already;
+                # a replace diffs against whatever is stored, so it can simply rerun
+                'reset': job["operation"] != JOB_REPLACE,
+                'replace': job["operation"] == JOB_REPLACE
+            })
+        
+        # Files saved as "<file_id>_<filename>" without a job record
+        known = self.job_store.known_file_ids()
+        upload_dir = settings.UPLOAD_DIR
+        for name in sorted(os.listdir(upload_dir)) if os.path.isdir(upload_dir) else []:
+            file_id, _, filename = name.partition("_")
+            if not filename or file_id in known or not _is_uuid(file_id):
+                continue
+            file_path = os.path.join(upload_dir, name)
+            # Loses to an upload request that registers its job first
+            if not self.job_store.create_job(file_id, filename, file_path, os.path.getsize(file_path)):
+                continue
+            pending.append({
+                'file_path': file_path,
+                'filename': filename,
+                'file_id': file_id
+            })
+        return pending
+    
+    async def replay_pending_jobs(self, pending: List[Dict[str, Any]]):
+        """Re-queue pending jobs collected at startup."""
+        for file_info in pending:
+            await self.processing_queue.put(file_info)
+        
+        if pending:
+            logger.info(f"Replayed {len(pending)} pending ingestion jobs")
+    
+    async def stop_workers(self):
+        """Cancel the ingestion workers."""
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+    
+    async def process_upload_queue(self, worker_id: int = 0):
+        """Ingestion worker: process files from the upload queue as they arrive."""
+        stats = self.worker_stats[worker_id]
         while True:
+            file_info = await self.processing_queue.get()
+            file_path = file_info['file_path']
+            filename = file_info['filename']
+            file_id = file_info['file_id']
+            
+            stats["current_file"] = filename
+            started = time.perf_counter()
+            job = None
             try:
-                if not self.is_processing and not self.processing_queue.empty():
-                    self.is_processing = True
-                    
-                    file_info = await self.processing_queue.get()
-                    file_path = file_info['file_path']
-                    filename = file_info['filename']
-                    file_id = file_info['file_id']
-                    
-                    try:
-                        # Process PDF
-                        chunks, page_count = self.pdf_processor.process_pdf(
-                            file_path, filename, file_id
-                        )
-                        
-                        # Generate embeddings
-                        texts = [chunk.page_content for chunk in chunks]
-                        embeddings = self.embedder.embed_documents(texts)
-                        
-                        # Store in vector database
-                        documents = [
-                            {
-                                'page_content': chunk.page_content,
-                                'metadata': chunk.metadata
-                            }
-                            for chunk in chunks
-                        ]
-                        self.vector_store.add_documents(documents, embeddings)
-                        
-                        logger.info(f"Successfully processed {filename}")
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing {filename}: {e}")
-                    
-                    finally:
-                        self.processing_queue.task_done()
-                        self.is_processing = False
+                self.job_store.mark_processing(file_id)
+                job = self.job_store.get_job(file_id)
+                uploaded_at = datetime.fromisoformat(job["pending_uploaded_at"] or job["created_at"]).timestamp()
+                if file_info.get('reset'):
+                    await asyncio.get_running_loop().run_in_executor(
+                        self.store_executor, self._delete_chunks, file_id
+                    )
+                chunks, page_count, embed_stats = await self._ingest_file(
+                    file_path, filename, file_id, uploaded_at, replace=file_info.get('replace', False)
+                )
+                self.job_store.mark_done(
+                    file_id, pages=page_count, chunks=len(chunks),
+                    duration=time.perf_counter() - started,
+                    reused_chunks=embed_stats["reused"],
+                    added_chunks=embed_stats["added"],
+                    unchanged_chunks=embed_stats["unchanged"],
+                    removed_chunks=embed_stats["removed"]
+                )
+                self._remove_replaced_file(job["file_path"], file_path)
+                stats["processed"] += 1
+                logger.info(
+                    f"Worker {worker_id} successfully processed {filename} "
+                    f"({embed_stats['added']} added, {embed_stats['unchanged']} unchanged, "
+                    f"{embed_stats['removed']} removed, {embed_stats['reused']} embeddings reused)"
+                )
                 
-                await asyncio.sleep(0.1)
+            except Exception as e:
+                self.job_store.mark_failed(file_id, str(e), duration=time.perf_counter() - started)
+                if job is not None and job["pending_file_path"]:
+                    # The stored revision stays; its upload is still job["file_path"]
+                    self._remove_replaced_file(file_path, job["file_path"])
+                stats["failed"] += 1
+                logger.error(f"Worker {worker_id} error processing {filename}: {e}")
+            
+            finally:
+                stats["busy_seconds"] += time.perf_counter() - started
+                stats["current_file"] = None
+                stats["last_finished_at"] = datetime.now().isoformat()
+                self.processing_queue.task_done()
+    
+    def _remove_replaced_file(self, old_path: str, current_path: str):
+        """Delete the upload of a revision that is no longer needed, unless the other revision reuses its path."""
+        if old_path != current_path and os.path.exists(old_path):
+            os.remove(old_path)
+    
+    def _extract_workers(self) -> int:
+        """Page extraction processes per document for the ingest pool."""
+        # Ingest processes already run one file each; don't nest another pool in them
+        if settings.INGEST_EXECUTOR == "process":
+            return 1
+        return settings.PDF_EXTRACT_WORKERS
+    
+    async def _ingest_file(self, file_path: str, filename: str, file_id: str, uploaded_at: float,
+                           replace: bool = False):
+        """Run extraction, embedding and storage in the worker pools."""
+        loop = asyncio.get_running_loop()
+        
+        # Extract and chunk PDF
+        chunks, page_count = await loop.run_in_executor(
+            self.ingest_executor,
+            process_pdf_file,
+            file_path, filename, file_id,
+            settings.CHUNK_SIZE, settings.CHUNK_OVERLAP,
+            self._extract_workers(), settings.PDF_PARALLEL_MIN_PAGES,
+            settings.PDF_EXTRACTOR, settings.CHUNKER,
+            settings.CHUNK_TOKENS, settings.CHUNK_TOKEN_OVERLAP,
+            settings.EMBEDDING_MODEL
+        )
+        
+        # Embed and store chunks
+        embed_stats = await loop.run_in_executor(
+            self.store_executor, self._embed_and_store, file_id, chunks, uploaded_at, replace
+        )
+        return chunks, page_count, embed_stats
+    
+    def _embed_and_store(self, file_id: str, chunks: List[Document], uploaded_at: float,
+                         replace: bool = False) -> Dict[str, int]:
+        """Embed chunks batch by batch, writing each batch as it completes (runs in a worker thread).
+        
+        With `replace`, the chunks are diffed by content hash against those
+        already stored for the file: matching chunks keep their embedding and
+        only get their metadata refreshed, new ones are embedded and added,
+        and chunks absent from the new revision are deleted last. Kept chunks
+        are only touched once every new chunk is stored; if storing fails,
+        the new chunks are removed again and the stored revision stays as it was.
+        """
+        batch_size = settings.EMBEDDING_BATCH_SIZE
+        embed_stats = {"embedded": 0, "reused": 0, "added": 0, "unchanged": 0, "removed": 0}
+        
+        keys = [chunk_hash(chunk.page_content, settings.EMBEDDING_MODEL) for chunk in chunks]
+        for chunk, key in zip(chunks, keys):
+            chunk.metadata["content_hash"] = key
+            # Upload time of the current revision (epoch seconds), for date filters
+            chunk.metadata["uploaded_at"] = uploaded_at
+        
+        # Match new chunks to stored ones with the same content
+        kept = {}
+        removed = []
+        if replace:
+            stored = defaultdict(list)
+            for chunk_id, key in self._stored_chunk_hashes(file_id).items():
+                stored[key].append(chunk_id)
+            for i, key in enumerate(keys):
+                if stored.get(key):
+                    kept[i] = stored[key].pop()
+            removed = [chunk_id for chunk_ids in stored.values() for chunk_id in chunk_ids]
+        
+        # IDs are unique per job: Chroma misbehaves when a deleted ID is added again,
+        # which content-derived IDs would do when a revision is reverted
+        new = [i for i in range(len(chunks)) if i not in kept]
+        nonce = uuid.uuid4().hex[:8]
+        ids = {i: f"{file_id}_{nonce}_{i}" for i in new}
+        
+        writes = []
+        error = None
+        try:
+            for start in range(0, len(new), batch_size):
+                batch = new[start:start + batch_size]
+                embeddings = self._embed_chunks(
+                    [chunks[i].page_content for i in batch], [keys[i] for i in batch], embed_stats
+                )
                 
+                # Store in vector database
+                documents = [
+                    {
+                        'page_content': chunks[i].page_content,
+                        'metadata': chunks[i].metadata
+                    }
+                    for i in batch
+                ]
+                batch_ids = [ids[i] for i in batch]
+                writes.append((batch_ids, [keys[i] for i in batch], self._write_chunks(documents, embeddings, batch_ids)))
+        except Exception as e:
+            error = e
+        
+        # Also when a later batch failed to embed, so deleting the document finds the ones that landed
+        write_error = self._record_writes(file_id, writes)
+        error = error or write_error
+        if error is not None:
+            if replace:
+                # Failed flushes may be partly written, so drop every queued ID
+                written = [chunk_id for batch_ids, _, _ in writes for chunk_id in batch_ids]
+                self.vector_store.delete_ids(written)
+                self.job_store.remove_chunks(written)
+            raise error
+        if self.lexical_index is not None:
+            self.lexical_index.add([ids[i] for i in new], [chunks[i].page_content for i in new])
+        
+        kept_indexes = list(kept)
+        for start in range(0, len(kept_indexes), batch_size):
+            indexes = kept_indexes[start:start + batch_size]
+            self.vector_store.update_metadata(
+                [kept[i] for i in indexes], [chunks[i].metadata for i in indexes]
+            )
+        
+        self.vector_store.delete_ids(removed)
+        if self.lexical_index is not None:
+            self.lexical_index.delete(removed)
+        self.job_store.remove_chunks(removed)
+        
+        embed_stats.update(added=len(new), unchanged=len(kept), removed=len(removed))
+        return embed_stats
+    
+    def _record_writes(self, file_id: str, writes: List[Tuple[List[str], List[str], Future]]) -> Optional[Exception]:
+        """Wait for queued chunk writes and record those that landed in the catalog; returns the first error."""
+        error = None
+        for batch_ids, batch_keys, write in writes:
+            try:
+                write.result()
             except Exception as e:
-                logger.error(f"Error in queue processing: {e}")
-                self.is_processing = False
-    
-    async def add_to_queue(self, file_path: str, filename: str, file_id: str):
-        """Add file to processing queue."""
-        await self.processing_queue.put({
-            'file_path': file_path,
-            'filename': filename,
-            'file_id': file_id
-        })
+                error = error or e
+                continue
+            self.job_store.add_chunks(file_id, batch_ids, batch_keys)
+        return error
+    
+    def _write_chunks(self, documents: List[Dict[str, Any]], embeddings: np.ndarray, ids: List[str]) -> Future:
+        """Write chunks through the write buffer, or directly when it is disabled."""
+        if self.write_buffer is not None:
+            return self.write_buffer.add(documents, embeddings, ids)
+        
+        future = Future()
+        try:
+            self.vector_store.add_documents(documents, embeddings, ids=ids)
+            future.set_result(None)
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    
+    def _stored_chunk_hashes(self, file_id: str) -> Dict[str, Optional[str]]:
+        """Chunk IDs and content hashes of a document, from the catalog when it has them."""
+        hashes = self.job_store.get_chunk_hashes(file_id)
+        if not hashes:
+            # Documents ingested before chunk IDs were recorded fall back to a metadata scan.
+            # Record what it finds, so chunks kept by a replace stay tracked alongside the new ones
+            hashes = self.vector_store.get_chunk_hashes(file_id)
+            self.job_store.add_chunks(file_id, list(hashes), list(hashes.values()))
+        return hashes
+    
+    def _delete_chunks(self, file_id: str):
+        """Delete all stored chunks of a document (runs in a worker thread)."""
+        chunk_ids = list(self.job_store.get_chunk_hashes(file_id))
+        if chunk_ids:
+            self.vector_store.delete_ids(chunk_ids)
+        else:
+            self.vector_store.delete_by_file_id(file_id)
+        if self.lexical_index is not None:
+            self.lexical_index.delete(chunk_ids)
+        self.job_store.clear_chunks(file_id)
+    
+    async def backfill_lexical_index(self):
+        """Index chunks stored before the keyword index existed."""
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.store_executor, self._backfill_lexical_index)
+        except Exception as e:
+            logger.error(f"Error backfilling keyword index: {e}")
+    
+    def _backfill_lexical_index(self):
+        """Read every cataloged chunk back from the vector store into the keyword index (runs in a worker thread)."""
+        chunk_ids = self.job_store.all_chunk_ids()
+        if len(chunk_ids) <= self.lexical_index.get_stats()["chunks"]:
+            return
+        # Chunks the index already has are skipped, so an interrupted backfill can rerun
+        batch_size = settings.VECTOR_WRITE_BATCH_SIZE or 1000
+        for start in range(0, len(chunk_ids), batch_size):
+            documents = self.vector_store.get_documents(chunk_ids[start:start + batch_size])
+            self.lexical_index.add([doc['id'] for doc in documents], [doc['content'] for doc in documents])
+        if chunk_ids:
+            logger.info(f"Backfilled keyword index with {len(chunk_ids)} chunks")
+    
+    def _embed_chunks(self, texts: List[str], keys: List[str], embed_stats: Dict[str, int]) -> np.ndarray:
+        """Embed chunk texts, sending only ones missing from the chunk cache to the model."""
+        if self.chunk_cache is None:
+            embed_stats["embedded"] += len(texts)
+            return self.embedder.encode(texts)
+        
+        cached = self.chunk_cache.get_many(keys)
+        
+        # Encode each distinct missing text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            encoded = dict(zip(missing, self.embedder.encode(list(missing.values()))))
+            self.chunk_cache.put_many(encoded)
+            cached.update(encoded)
+        
+        embed_stats["embedded"] += len(missing)
+        embed_stats["reused"] += len(texts) - len(missing)
+        return np.stack([cached[key] for key in keys])
+    
+    def queue_full(self) -> bool:
+        """Whether the ingestion queue is at capacity."""
+        return self.processing_queue.full()
+    
+    async def add_to_queue(self, file_path: str, filename: str, file_id: str, size: int = 0,
+                           content_hash: Optional[str] = None, replace: bool = False):
+        """Add file to processing queue; raises asyncio.QueueFull when at capacity.
+        
+        With `replace`, the file is a new revision of the existing document
+        `file_id` and only its changed chunks are re-embedded.
+        """
+        if replace:
+            self.job_store.start_replace(file_id, filename, file_path, size, content_hash)
+        elif not self.job_store.create_job(file_id, filename, file_path, size, content_hash, JOB_INGEST):
+            # Another worker process starting up adopted the saved file and queued it
+            return self.processing_queue.qsize()
+        try:
+            self.processing_queue.put_nowait({
+                'file_path': file_path,
+                'filename': filename,
+                'file_id': file_id,
+                'replace': replace
+            })
+        except asyncio.QueueFull:
+            if replace:
+                self.job_store.cancel_replace(file_id)
+            else:
+                self.job_store.delete_job(file_id)
+            raise
         return self.processing_queue.qsize()
     
-    async def query_documents(self, query: str, top_k: int = 3) -> AsyncGenerator[str, None]:
-        """Query documents and stream response."""
-        start_time = datetime.now()
+    def get_job(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Get the ingestion job record for a file."""
+        return self.job_store.get_job(file_id)
+    
+    async def delete_document(self, file_id: str):
+        """Delete a document's chunks, catalog entry and uploaded file."""
+        job = self.job_store.get_job(file_id)
+        await asyncio.get_running_loop().run_in_executor(self.store_executor, self._delete_chunks, file_id)
+        self.job_store.delete_document(file_id)
+        if job is not None and os.path.exists(job["file_path"]):
+            os.remove(job["file_path"])
+        logger.info(f"Deleted document {file_id}")
+    
+    def list_documents(self, limit: int = 50, cursor: Optional[int] = None):
+        """One page of the document catalog and the cursor of the next page."""
+        return self.job_store.list_documents(limit, cursor)
+    
+    def find_duplicate(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Job of an already uploaded file with identical contents, if any."""
+        return self.job_store.find_by_content_hash(content_hash)
+    
+    async def query_documents(self, query: str, top_k: int = 3,
+                              filters: Optional[QueryFilters] = None) -> AsyncGenerator[str, None]:
+        """Query documents and stream the sources, then the answer as it is generated."""
+        query_start = time.perf_counter()
+        timings = {}
         
         try:
             # Generate query embedding
-            query_embedding = self.embedder.embed_query(query)
+            stage_start = time.perf_counter()
+            query_embedding = await self._embed_query(query)
+            timings["embed_ms"] = _elapsed_ms(stage_start)
             
-            # Search for relevant documents
-            search_results = self.vector_store.search(query_embedding, top_k=top_k)
+            # Search for relevant documents, over-fetching when a reranker narrows them down
+            stage_start = time.perf_counter()
+            candidates = max(top_k, settings.RERANK_CANDIDATES) if self.reranker is not None else top_k
+            search_results = await asyncio.get_running_loop().run_in_executor(
+                self.batch_executor, self._retrieve,
+                query, query_embedding, candidates, self._build_filter(filters)
+            )
+            timings["retrieve_ms"] = _elapsed_ms(stage_start)
+            
+            if self.reranker is not None and search_results:
+                stage_start = time.perf_counter()
+                search_results, reranked = await self.reranker.rerank(query, search_results, top_k)
+                timings["rerank_ms"] = _elapsed_ms(stage_start)
+                timings["reranked"] = reranked
             
             if not search_results:
                 yield self._format_stream_chunk(
@@ -101,57 +559,153 @@ class RAGService:
                 )
                 return
             
+            # Sources are known before generation starts, so send them first
+            sources = [self._to_source_document(result).model_dump() for result in search_results]
+            yield self._format_stream_chunk("sources", sources=sources)
+            timings["ttfb_ms"] = _elapsed_ms(query_start)
+            
             # Prepare context from search results
             context = "\n\n".join([
                 f"[Source {i+1} from {result['metadata']['source']}]: {result['content'][:500]}..."
                 for i, result in enumerate(search_results)
             ])
             
-            # Generate answer (simplified - in production, use an LLM)
-            answer = await self._generate_answer(query, context)
-            
-            # Stream answer chunks
-            chunk_size = 50
-            for i in range(0, len(answer), chunk_size):
-                chunk = answer[i:i + chunk_size]
-                yield self._format_stream_chunk("answer_chunk", content=chunk)
-                await asyncio.sleep(0.01)  # Simulate streaming
-            
-            # Stream sources
-            yield self._format_stream_chunk("sources", sources=search_results)
+            # Forward each piece of the answer as soon as the generator produces it
+            stage_start = time.perf_counter()
+            answer = self.generator.stream(query, context)
+            try:
+                async for piece in answer:
+                    yield self._format_stream_chunk("answer_chunk", content=piece)
+                    if "first_token_ms" not in timings:
+                        timings["first_token_ms"] = _elapsed_ms(query_start)
+            finally:
+                await answer.aclose()
+            timings["generate_ms"] = _elapsed_ms(stage_start)
             
-            processing_time = (datetime.now() - start_time).total_seconds()
-            logger.info(f"Query processed in {processing_time:.2f}s")
+            timings["total_ms"] = _elapsed_ms(query_start)
+            self.stream_latency.append((timings["ttfb_ms"], timings.get("first_token_ms", timings["total_ms"])))
+            yield self._format_stream_chunk("timings", timings=timings)
+            logger.info(f"Query processed in {timings['total_ms'] / 1000:.2f}s: {timings}")
             
         except Exception as e:
             logger.error(f"Error processing query: {e}")
             yield self._format_stream_chunk("error", message=str(e))
     
-    async def _generate_answer(self, query: str, context: str) -> str:
-        """Generate answer using context (simplified version)."""
-        # In production, replace this with actual LLM call (OpenAI, Anthropic, etc.)
-        
-        prompt = f"""Based on the following context, answer the question.
-        
-        Question: {query}
-        
-        Context:
-        {context}
+    def _retrieve(self, query: str, query_embedding: np.ndarray, top_k: int,
+                  filter_by: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Vector search results, fused with BM25 keyword matches when hybrid search is enabled."""
+        if self.lexical_index is None:
+            return self.vector_store.search(query_embedding, top_k=top_k, filter_by=filter_by)
+        return self._retrieve_batch([query], query_embedding[None, :], top_k, filter_by)[0]
+    
+    def _retrieve_batch(self, queries: List[str], query_embeddings: np.ndarray, top_k: int,
+                        filter_by: Optional[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Results of `_retrieve` for several queries, with one vector search and one payload lookup."""
+        if self.lexical_index is None:
+            return self.vector_store.search_batch(query_embeddings, top_k=top_k, filter_by=filter_by)
         
-        Answer: """
+        candidates = max(top_k, settings.HYBRID_CANDIDATES)
+        vector_results = self.vector_store.search_batch(query_embeddings, top_k=candidates, filter_by=filter_by)
+        # Keyword matches outside the filter are dropped, so look further down that list
+        lexical_hits = [
+            self.lexical_index.search(query, top_k=candidates * (4 if filter_by else 1)) for query in queries
+        ]
+        chunk_ids = list(dict.fromkeys(chunk_id for hits in lexical_hits for chunk_id, _ in hits))
+        documents = {document['id']: document for document in self.vector_store.get_documents(chunk_ids, filter_by)}
+        fused = []
+        for vector_hits, hits in zip(vector_results, lexical_hits):
+            lexical_results = [documents[chunk_id] for chunk_id, _ in hits if chunk_id in documents]
+            fused.append(_reciprocal_rank_fusion([vector_hits, lexical_results[:candidates]], top_k, settings.RRF_K))
+        return fused
+    
+    async def search_batch(self, queries: List[str], top_k: int = 3,
+                           filters: Optional[QueryFilters] = None) -> List[List[SourceDocument]]:
+        """Retrieve sources for many queries at once, without generating answers.
         
-        # Simulate LLM processing
-        await asyncio.sleep(0.5)
+        The queries are embedded in one batch and searched with one
+        multi-query vector store call on the batch thread. Reranking, when
+        enabled, runs per query within one RERANK_BUDGET_MS for the whole
+        batch; queries left when it runs out keep their retrieval order.
+        """
+        query_embeddings = await self._embed_queries(queries)
+        candidates = max(top_k, settings.RERANK_CANDIDATES) if self.reranker is not None else top_k
+        results = await asyncio.get_running_loop().run_in_executor(
+            self.batch_executor, self._retrieve_batch,
+            queries, query_embeddings, candidates, self._build_filter(filters)
+        )
+        if self.reranker is not None:
+            deadline = time.perf_counter() + settings.RERANK_BUDGET_MS / 1000
+            results = [
+                (await self.reranker.rerank(
+                    query, query_results, top_k, budget_ms=(deadline - time.perf_counter()) * 1000
+                ))[0]
+                for query, query_results in zip(queries, results)
+            ]
+        return [[self._to_source_document(result) for result in query_results] for query_results in results]
+    
+    def _build_filter(self, filters: Optional[QueryFilters]) -> Optional[Dict[str, Any]]:
+        """Translate query filters into a Chroma-style where clause over chunk metadata."""
+        if filters is None:
+            return None
+        conditions = []
+        if filters.file_ids is not None:
+            conditions.append({"file_id": {"$in": filters.file_ids}})
+        if filters.filenames is not None:
+            conditions.append({"source": {"$in": filters.filenames}})
+        if filters.page_from is not None:
+            conditions.append({"page": {"$gte": filters.page_from}})
+        if filters.page_to is not None:
+            conditions.append({"page": {"$lte": filters.page_to}})
+        if filters.uploaded_after is not None:
+            conditions.append({"uploaded_at": {"$gte": filters.uploaded_after.timestamp()}})
+        if filters.uploaded_before is not None:
+            conditions.append({"uploaded_at": {"$lte": filters.uploaded_before.timestamp()}})
         
-        # Simple template-based response (replace with actual LLM in production)
-        answers = [
-            f"Based on the documents you've uploaded, here's what I found about '{query}':\n\nThe documents discuss various aspects of this topic, particularly focusing on implementation details and best practices.",
-            f"From the analyzed documents regarding '{query}':\n\nKey findings include important considerations for implementation and several recommendations for optimal performance.",
-            f"Regarding your question about '{query}', the documents indicate:\n\nSeveral approaches are discussed, with emphasis on practical applications and potential challenges."
-        ]
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+    
+    async def _embed_query(self, query: str) -> np.ndarray:
+        """Embed a query, reusing cached embeddings and batching concurrent misses."""
+        normalized = _normalize_query(query)
+        key = (settings.EMBEDDING_MODEL, normalized)
+        embedding = self.query_embedding_cache.get(key)
+        if embedding is None:
+            embedding = await self.query_batcher.embed(normalized)
+            self.query_embedding_cache.put(key, embedding)
+        return embedding
+    
+    async def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed many queries, encoding the ones missing from the cache in a single call."""
+        normalized = [_normalize_query(query) for query in queries]
+        embeddings = {}
+        for text in normalized:
+            embedding = self.query_embedding_cache.get((settings.EMBEDDING_MODEL, text))
+            if embedding is not None:
+                embeddings[text] = embedding
         
-        import random
-        return random.choice(answers) + "\n\nThis answer is generated based on semantic search results from your uploaded documents."
+        missing = [text for text in dict.fromkeys(normalized) if text not in embeddings]
+        if missing:
+            encoded = await asyncio.get_running_loop().run_in_executor(
+                self.query_batcher.executor, self.embedder.encode, missing
+            )
+            for text, embedding in zip(missing, encoded):
+                self.query_embedding_cache.put((settings.EMBEDDING_MODEL, text), embedding)
+                embeddings[text] = embedding
+        return np.stack([embeddings[text] for text in normalized])
+    
+    def _to_source_document(self, result: Dict[str, Any]) -> SourceDocument:
+        """Convert a vector store result into a source document."""
+        metadata = result['metadata']
+        return SourceDocument(
+            file_id=metadata.get('file_id', ''),
+            filename=metadata.get('source', ''),
+            content=result['content'],
+            page=metadata.get('page'),
+            chunk_index=metadata.get('chunk_index', 0),
+            score=result['score'],
+            metadata=metadata
+        )
     
     def _format_stream_chunk(self, chunk_type: str, **kwargs) -> str:
         """Format a stream chunk."""
@@ -161,18 +715,54 @@ class RAGService:
             chunk_data["content"] = kwargs.get("content", "")
         elif chunk_type == "sources":
             chunk_data["sources"] = kwargs.get("sources", [])
+        elif chunk_type == "timings":
+            chunk_data["timings"] = kwargs.get("timings", {})
         elif chunk_type == "error":
             chunk_data["message"] = kwargs.get("message", "Unknown error")
         
         return f"data: {json.dumps(chunk_data)}\n\n"
     
+    def shutdown(self):
+        """Release worker pools."""
+        self.ingest_executor.shutdown(wait=False, cancel_futures=True)
+        if self.store_executor is not self.ingest_executor:
+            self.store_executor.shutdown(wait=False, cancel_futures=True)
+        self.query_batcher.executor.shutdown(wait=False, cancel_futures=True)
+        self.batch_executor.shutdown(wait=False, cancel_futures=True)
+        if self.reranker is not None:
+            self.reranker.executor.shutdown(wait=False, cancel_futures=True)
+        if self.write_buffer is not None:
+            self.write_buffer.close()
+        shutdown_extract_pool()
+    
+    def _stream_latency_stats(self) -> Dict[str, Any]:
+        """Generator in use and p50/p95 time to first byte and first answer token of recent queries."""
+        stats = {**self.generator.get_stats(), "queries": len(self.stream_latency)}
+        if self.stream_latency:
+            latency = np.asarray(self.stream_latency)
+            for i, name in enumerate(("ttfb", "first_token")):
+                stats[f"{name}_p50_ms"] = round(float(np.percentile(latency[:, i], 50)), 2)
+                stats[f"{name}_p95_ms"] = round(float(np.percentile(latency[:, i], 95)), 2)
+        return stats
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get service statistics."""
         vector_stats = self.vector_store.get_stats()
         
         return {
-            "documents": vector_stats.get("documents", 0),
+            "documents": self.job_store.count_documents(JOB_DONE),
             "chunks": vector_stats.get("chunks", 0),
             "queue": self.processing_queue.qsize(),
-            "is_processing": self.is_processing
+            "queue_capacity": self.processing_queue.maxsize,
+            "is_processing": any(w["current_file"] for w in self.worker_stats.values()),
+            "workers": list(self.worker_stats.values()),
+            "jobs": self.job_store.get_stats(),
+            "chunk_cache": self.chunk_cache.get_stats() if self.chunk_cache is not None else None,
+            "query_embedding_cache": self.query_embedding_cache.get_stats(),
+            "query_batching": self.query_batcher.get_stats(),
+            "result_cache": vector_stats.get("result_cache"),
+            "lexical_index": self.lexical_index.get_stats() if self.lexical_index is not None else None,
+            "reranker": self.reranker.get_stats() if self.reranker is not None else None,
+            "streaming": self._stream_latency_stats(),
+            "vector_writes": self.write_buffer.get_stats() if self.write_buffer is not None else None
         }
\ No newline at end of file
@@ -0,0 +1,82 @@
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CrossEncoderReranker:
+    """Rerank retrieved chunks with a sentence-transformers cross-encoder.
+    
+    Every (query, chunk) pair of one query is scored in a single batched
+    forward pass on a dedicated thread, so the event loop stays free. A
+    rerank that does not finish within `budget_ms` (waiting for the thread
+    included) is abandoned and the candidates keep their retrieval order.
+    """
+    
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", budget_ms: float = 300.0,
+                 max_length: int = 512, executor: Optional[Executor] = None):
+        try:
+            from sentence_transformers import CrossEncoder
+            self.model = CrossEncoder(model_name, max_length=max_length)
+            self.model_name = model_name
+            logger.info(f"Loaded reranking model: {model_name}")
+        except ImportError:
+            logger.error("sentence-transformers not installed. Install with: pip install sentence-transformers")
+            raise
+        self.budget = max(0.0, budget_ms) / 1000
+        # One thread: a second concurrent forward pass would only slow both down
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self.reranked = 0
+        self.timeouts = 0
+        self.failures = 0
+    
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        """Relevance score of each text for the query, in one batch."""
+        scores = self.model.predict([(query, text) for text in texts], batch_size=max(1, len(texts)),
+                                    show_progress_bar=False)
+        return np.asarray(scores, dtype=np.float32)
+    
+    async def rerank(self, query: str, results: List[Dict[str, Any]], top_k: int,
+                     budget_ms: Optional[float] = None) -> Tuple[List[Dict[str, Any]], bool]:
+        """The top_k results by cross-encoder score, and whether reranking happened.
+        
+        `budget_ms` overrides the configured budget, e.g. with what is left
+        of a deadline shared by several queries. On timeout or error the
+        first top_k results are returned unchanged.
+        """
+        if len(results) <= 1:
+            return results[:top_k], False
+        budget = self.budget if budget_ms is None else max(0.0, budget_ms) / 1000
+        if budget <= 0:
+            self.timeouts += 1
+            return results[:top_k], False
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, self.score, query, [result['content'] for result in results]
+        )
+        try:
+            # Cancelling a pass still waiting for the thread keeps a backlog from building up
+            scores = await asyncio.wait_for(future, timeout=budget)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning(f"Reranking exceeded {budget * 1000:.0f}ms budget; keeping retrieval order")
+            return results[:top_k], False
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Error reranking results: {e}")
+            return results[:top_k], False
+        
+        self.reranked += 1
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return [{**results[i], 'score': float(scores[i])} for i in order], True
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Reranking counters."""
+        return {
+            "model": self.model_name,
+            "budget_ms": self.budget * 1000,
+            "reranked": self.reranked,
+            "timeouts": self.timeouts,
+            "failures": self.failures
+        }
@@ -1,21 +1,122 @@
 import chromadb
 from chromadb.config import Settings
-from typing import List, Dict, Any, Optional
+import json
+import threading
+import numpy as np
+from typing import List, Dict, Any, Optional, Union
 import logging
 from app.core.config import settings
+from app.services.cache import LRUCache
 
 logger = logging.getLogger(__name__)
 
-class VectorStore:
+def _copy_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copy search results so callers cannot mutate cached entries."""
+    return [{**result, 'metadata': dict(result['metadata'])} for result in results]
+
+class BaseVectorStore:
+    """Search result caching shared by the vector store backends.
+    
+    Backends implement `_search` and call `_bump_generation` after every
+    mutation so cached results are never served for stale contents.
+    """
+    
+    def __init__(self):
+        # Bumped on every mutation; cached search results are keyed by it
+        self.generation = 0
+        self._generation_lock = threading.Lock()
+        self.result_cache = (
+            LRUCache(max_size=settings.RESULT_CACHE_SIZE)
+            if settings.RESULT_CACHE_ENABLED else None
+        )
+    
+    def _bump_generation(self):
+        """Invalidate cached search results after the collection changes."""
+        with self._generation_lock:
+            self.generation += 1
+        if self.result_cache is not None:
+            self.result_cache.clear()
+    
+    def _cache_key(self, query_embedding: Union[np.ndarray, List[float]], top_k: int, filter_by: Optional[Dict]):
+        return (
+            self.generation,
+            np.asarray(query_embedding).tobytes(),
+            top_k,
+            json.dumps(filter_by, sort_keys=True)
+        )
+    
+    def search(self, query_embedding: Union[np.ndarray, List[float]], top_k: int = 3, filter_by: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        """Search for similar documents."""
+        try:
+            if self.result_cache is not None:
+                cache_key = self._cache_key(query_embedding, top_k, filter_by)
+                cached = self.result_cache.get(cache_key)
+                if cached is not None:
+                    return _copy_results(cached)
+            
+            formatted_results = self._search(query_embedding, top_k, filter_by)
+            
+            if self.result_cache is not None:
+                self.result_cache.put(cache_key, _copy_results(formatted_results))
+            
+            logger.info(f"Found {len(formatted_results)} results for query")
+            return formatted_results
+            
+        except Exception as e:
+            logger.error(f"Error searching vector store: {e}")
+            raise
+    
+    def search_batch(self, query_embeddings: Union[np.ndarray, List[List[float]]], top_k: int = 3,
+                     filter_by: Optional[Dict] = None) -> List[List[Dict[str, Any]]]:
+        """Search for several queries at once; one result list per query embedding."""
+        try:
+            query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+            results: List[Optional[List[Dict[str, Any]]]] = [None] * len(query_embeddings)
+            cache_keys = []
+            if self.result_cache is not None:
+                cache_keys = [self._cache_key(embedding, top_k, filter_by) for embedding in query_embeddings]
+                for i, cache_key in enumerate(cache_keys):
+                    cached = self.result_cache.get(cache_key)
+                    if cached is not None:
+                        results[i] = _copy_results(cached)
+            
+            missing = [i for i, result in enumerate(results) if result is None]
+            if missing:
+                for i, formatted_results in zip(missing, self._search_batch(query_embeddings[missing], top_k, filter_by)):
+                    results[i] = formatted_results
+                    if self.result_cache is not None:
+                        self.result_cache.put(cache_keys[i], _copy_results(formatted_results))
+            
+            logger.info(f"Searched {len(results)} queries ({len(missing)} uncached)")
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error searching vector store: {e}")
+            raise
+    
+    def _search(self, query_embedding: Union[np.ndarray, List[float]], top_k: int,
+                filter_by: Optional[Dict]) -> List[Dict[str, Any]]:
+        """Uncached similarity search returning content, metadata, score and id per hit."""
+        raise NotImplementedError
+    
+    def _search_batch(self, query_embeddings: np.ndarray, top_k: int,
+                      filter_by: Optional[Dict]) -> List[List[Dict[str, Any]]]:
+        """Uncached search for several queries; backends override this to search them together."""
+        return [self._search(query_embedding, top_k, filter_by) for query_embedding in query_embeddings]
+
+class VectorStore(BaseVectorStore):
     """Vector database service using ChromaDB."""
     
     def __init__(self):
+        super().__init__()
         self.client = chromadb.PersistentClient(
             path=settings.VECTOR_STORE_PATH,
             settings=Settings(anonymized_telemetry=False)
         )
         self.collection_name = settings.COLLECTION_NAME
         self.collection = self._get_or_create_collection()
+        # Largest insert Chroma accepts in one call
+        self.max_batch_size = getattr(self.client, "max_batch_size", 5000)
     
     def _get_or_create_collection(self):
         """Get existing collection or create new one."""
@@ -33,21 +134,30 @@ class VectorStore:
         
         return collection
     
-    def add_documents(self, documents: List[Dict[str, Any]], embeddings: List[List[float]]):
+    def add_documents(self, documents: List[Dict[str, Any]], embeddings: Union[np.ndarray, List[List[float]]],
+                      ids: Optional[List[str]] = None):
         """Add documents to vector store."""
         try:
-            # Prepare data for ChromaDB
-            ids = [f"doc_{i}_{doc['metadata']['file_id']}" for i, doc in enumerate(documents)]
+            # Prepare data for ChromaDB; default IDs come from the chunk index so batches of one file don't collide
+            if ids is None:
+                ids = [f"doc_{doc['metadata']['chunk_index']}_{doc['metadata']['file_id']}" for doc in documents]
             texts = [doc['page_content'] for doc in documents]
             metadatas = [doc['metadata'] for doc in documents]
+            if isinstance(embeddings, np.ndarray):
+                embeddings = embeddings.tolist()
             
-            # Add to collection
-            self.collection.add(
-                embeddings=embeddings,
-                documents=texts,
-                metadatas=metadatas,
-                ids=ids
-            )
+            # Add to collection, in slices Chroma accepts
+            try:
+                for start in range(0, len(ids), self.max_batch_size):
+                    end = start + self.max_batch_size
+                    self.collection.add(
+                        embeddings=embeddings[start:end],
+                        documents=texts[start:end],
+                        metadatas=metadatas[start:end],
+                        ids=ids[start:end]
+                    )
+            finally:
+                self._bump_generation()
             
             logger.info(f"Added {len(documents)} documents to vector store")
             
@@ -55,33 +165,35 @@ class VectorStore:
             logger.error(f"Error adding documents to vector store: {e}")
             raise
     
-    def search(self, query_embedding: List[float], top_k: int = 3, filter_by: Optional[Dict] = None) -> List[Dict[str, Any]]:
-        """Search for similar documents."""
-        try:
-            # Perform similarity search
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k,
-                where=filter_by
-            )
-            
-            # Format results
-            formatted_results = []
+    def _search(self, query_embedding: Union[np.ndarray, List[float]], top_k: int,
+                filter_by: Optional[Dict]) -> List[Dict[str, Any]]:
+        """Similarity search in the Chroma collection."""
+        return self._search_batch(np.asarray([query_embedding], dtype=np.float32), top_k, filter_by)[0]
+    
+    def _search_batch(self, query_embeddings: np.ndarray, top_k: int,
+                      filter_by: Optional[Dict]) -> List[List[Dict[str, Any]]]:
+        """Similarity search for several queries in one Chroma query."""
+        # Perform similarity search
+        results = self.collection.query(
+            query_embeddings=query_embeddings.tolist(),
+            n_results=top_k,
+            where=filter_by
+        )
+        
+        # Format results
+        formatted_results = []
+        for i in range(len(query_embeddings)):
+            hits = []
             if results['documents']:
-                for i in range(len(results['documents'][0])):
-                    formatted_results.append({
-                        'content': results['documents'][0][i],
-                        'metadata': results['metadatas'][0][i],
-                        'score': 1 - results['distances'][0][i] if results['distances'] else 0,
-                        'id': results['ids'][0][i]
+                for j in range(len(results['documents'][i])):
+                    hits.append({
+                        'content': results['documents'][i][j],
+                        'metadata': results['metadatas'][i][j],
+                        'score': 1 - results['distances'][i][j] if results['distances'] else 0,
+                        'id': results['ids'][i][j]
                     })
-            
-            logger.info(f"Found {len(formatted_results)} results for query")
-            return formatted_results
-            
-        except Exception as e:
-            logger.error(f"Error searching vector store: {e}")
-            raise
+            formatted_results.append(hits)
+        return formatted_results
     
     def get_stats(self) -> Dict[str, int]:
         """Get vector store statistics."""
@@ -89,7 +201,9 @@ class VectorStore:
             count = self.collection.count()
             return {
                 "documents": count,
-                "chunks": count  # In ChromaDB, each document is a chunk
+                "chunks": count,  # In ChromaDB, each document is a chunk
+                "generation": self.generation,
+                "result_cache": self.result_cache.get_stats() if self.result_cache is not None else None
             }
         except Exception as e:
             logger.error(f"Error getting vector store stats: {e}")
@@ -102,9 +216,81 @@ class VectorStore:
             results = self.collection.get(where={"file_id": file_id})
             
             if results['ids']:
-                self.collection.delete(ids=results['ids'])
+                try:
+                    self.collection.delete(ids=results['ids'])
+                finally:
+                    self._bump_generation()
                 logger.info(f"Deleted {len(results['ids'])} documents for file {file_id}")
             
         except Exception as e:
             logger.error(f"Error deleting documents for file {file_id}: {e}")
-            raise
\ No newline at end of file
+            raise
+    
+    def get_chunk_hashes(self, file_id: str) -> Dict[str, Optional[str]]:
+        """Map each stored chunk ID of a file to its content hash (None for chunks stored without one)."""
+        try:
+            results = self.collection.get(where={"file_id": file_id}, include=["metadatas"])
+            return {
+                chunk_id: (metadata or {}).get("content_hash")
+                for chunk_id, metadata in zip(results['ids'], results['metadatas'])
+            }
+            
+        except Exception as e:
+            logger.error(f"Error reading chunks for file {file_id}: {e}")
+            raise
+    
+    def get_documents(self, ids: List[str], filter_by: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        """Stored chunks with the given IDs that match an optional where clause, in ID order."""
+        if not ids:
+            return []
+        try:
+            results = self.collection.get(ids=ids, where=filter_by, include=["documents", "metadatas"])
+            found = {
+                chunk_id: {'content': document, 'metadata': metadata, 'id': chunk_id}
+                for chunk_id, document, metadata in zip(results['ids'], results['documents'], results['metadatas'])
+            }
+            return [found[chunk_id] for chunk_id in ids if chunk_id in found]
+            
+        except Exception as e:
+            logger.error(f"Error reading documents: {e}")
+            raise
+    
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Replace the metadata of stored chunks without touching their embeddings."""
+        if not ids:
+            return
+        try:
+            try:
+                self.collection.update(ids=ids, metadatas=metadatas)
+            finally:
+                self._bump_generation()
+            logger.info(f"Updated metadata of {len(ids)} documents")
+            
+        except Exception as e:
+            logger.error(f"Error updating document metadata: {e}")
+            raise
+    
+    def delete_ids(self, ids: List[str]):
+        """Delete chunks by ID."""
+        if not ids:
+            return
+        try:
+            try:
+                self.collection.delete(ids=ids)
+            finally:
+                self._bump_generation()
+            logger.info(f"Deleted {len(ids)} documents")
+            
+        except Exception as e:
+            logger.error(f"Error deleting documents: {e}")
+            raise
+
+def get_vector_store() -> BaseVectorStore:
+    """Factory function to get the configured vector store backend."""
+    backend = settings.VECTOR_STORE_BACKEND.lower()
+    if backend == "numpy":
+        from app.services.numpy_store import NumpyVectorStore
+        return NumpyVectorStore()
+    if backend != "chroma":
+        raise ValueError(f"Unknown vector store backend: {backend} (choose from chroma, numpy)")
+    return VectorStore()
@@ -0,0 +1,141 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple, Union
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class VectorWriteBuffer:
+    """Coalesce vector store inserts from concurrent ingest jobs into bulk writes.
+    
+    Rows queued within `flush_interval_ms` of the first pending one (or until
+    `batch_size` rows are pending) are written by a background thread in a
+    single `add_documents` call of at most `batch_size` rows (a larger single
+    insert is written alone and split into slices the store accepts). Each
+    caller gets a future that resolves once its rows are stored.
+    
+    When the store falls behind, `add` blocks while `max_pending_rows` rows
+    are waiting, so embedded batches don't pile up in memory.
+    """
+    
+    def __init__(self, vector_store, batch_size: int = 1000, flush_interval_ms: float = 50.0,
+                 max_pending_rows: int = 0):
+        self.vector_store = vector_store
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.0, flush_interval_ms) / 1000
+        self.max_pending_rows = max(0, max_pending_rows)
+        self._pending: List[Tuple[List[Dict[str, Any]], np.ndarray, List[str], Future]] = []
+        self._pending_rows = 0
+        self._first_pending_at: Optional[float] = None
+        self._condition = threading.Condition()
+        self._closed = False
+        self.flushes = 0
+        self.rows = 0
+        self.largest_flush = 0
+        self.blocked_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name="vector-write", daemon=True)
+        self._thread.start()
+    
+    def add(self, documents: List[Dict[str, Any]], embeddings: Union[np.ndarray, List[List[float]]],
+            ids: List[str]) -> Future:
+        """Queue rows for the next flush; the returned future resolves when they are written.
+        
+        Blocks while the buffer is full; an insert larger than the limit waits for an empty buffer.
+        """
+        future = Future()
+        with self._condition:
+            if self.max_pending_rows and self._pending and self._pending_rows + len(ids) > self.max_pending_rows:
+                started = time.monotonic()
+                while (not self._closed and self._pending
+                       and self._pending_rows + len(ids) > self.max_pending_rows):
+                    self._condition.wait()
+                self.blocked_seconds += time.monotonic() - started
+            if self._closed:
+                raise RuntimeError("Vector write buffer is closed")
+            self._pending.append((documents, np.asarray(embeddings, dtype=np.float32), ids, future))
+            self._pending_rows += len(ids)
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+            # Writers waiting for room share the condition with the flush thread
+            self._condition.notify_all()
+        return future
+    
+    def _take_batch(self) -> Optional[List[Tuple[List[Dict[str, Any]], np.ndarray, List[str], Future]]]:
+        """Block until a flush is due and return its rows; None once closed and drained."""
+        with self._condition:
+            while True:
+                if not self._pending:
+                    if self._closed:
+                        return None
+                    self._condition.wait()
+                    continue
+                
+                remaining = self._first_pending_at + self.flush_interval - time.monotonic()
+                if self._closed or self._pending_rows >= self.batch_size or remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            
+            # Take whole inserts up to batch_size rows; the rest waits for the next flush
+            taken = rows = 0
+            while taken < len(self._pending) and (taken == 0 or rows + len(self._pending[taken][2]) <= self.batch_size):
+                rows += len(self._pending[taken][2])
+                taken += 1
+            batch, self._pending = self._pending[:taken], self._pending[taken:]
+            self._pending_rows -= rows
+            # Leftover rows are already due
+            self._first_pending_at = self._first_pending_at if self._pending else None
+            self._condition.notify_all()
+            return batch
+    
+    def _run(self):
+        """Flush thread: write pending rows as flushes come due."""
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            self._write(batch)
+    
+    def _write(self, batch: List[Tuple[List[Dict[str, Any]], np.ndarray, List[str], Future]]):
+        """Write one flush and resolve its futures."""
+        documents = [document for item in batch for document in item[0]]
+        ids = [chunk_id for item in batch for chunk_id in item[2]]
+        
+        try:
+            embeddings = np.concatenate([item[1] for item in batch])
+            self.vector_store.add_documents(documents, embeddings, ids=ids)
+        except Exception as e:
+            # Rows of a failed flush may be partly written; every job in it fails
+            logger.error(f"Error flushing {len(ids)} rows to the vector store: {e}")
+            for *_, future in batch:
+                future.set_exception(e)
+            return
+        
+        self.flushes += 1
+        self.rows += len(ids)
+        self.largest_flush = max(self.largest_flush, len(ids))
+        for *_, future in batch:
+            future.set_result(None)
+    
+    def close(self):
+        """Flush everything still pending and stop the flush thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Flush counters."""
+        return {
+            "flushes": self.flushes,
+            "rows": self.rows,
+            "avg_flush_size": self.rows / self.flushes if self.flushes else 0.0,
+            "largest_flush": self.largest_flush,
+            "pending_rows": self._pending_rows,
+            "max_pending_rows": self.max_pending_rows,
+            "blocked_seconds": self.blocked_seconds,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": self.flush_interval * 1000
+        }
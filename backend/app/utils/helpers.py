@@ -0,0 +1,39 @@
+import hashlib
+import os
+from typing import Optional, Tuple
+
+import aiofiles
+from fastapi import UploadFile
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured size limit."""
+    
+    def __init__(self, max_size: int):
+        super().__init__(f"File too large (max {round(max_size / (1024 * 1024), 1):g}MB)")
+        self.max_size = max_size
+
+async def save_upload_file(upload: UploadFile, dest_path: str, chunk_size: int = 1024 * 1024,
+                           max_size: Optional[int] = None) -> Tuple[int, str]:
+    """Copy an upload to disk chunk by chunk, returning its size and SHA-256.
+    
+    Only one chunk is held in memory at a time. The copy is aborted and the
+    partial file removed as soon as `max_size` is exceeded.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(dest_path, 'wb') as out_file:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise UploadTooLargeError(max_size)
+                digest.update(chunk)
+                await out_file.write(chunk)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+    return size, digest.hexdigest()
@@ -0,0 +1,78 @@
+"""Benchmark batched against one-at-a-time query throughput.
+
+    python benchmarks/batch_query.py --vectors 100000 --queries 500
+    python benchmarks/batch_query.py --backends numpy chroma --embed
+
+Loads --vectors random normalized vectors into a fresh store per backend
+and runs --queries searches twice: one search() call per query, as
+/query does, and search_batch() over slices of --batch queries, as
+/query/batch does. With --embed, it also times the configured embedding
+model encoding the query texts one at a time against one encode() call
+per batch; this needs the model to be available locally.
+
+The result cache is disabled.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ["RESULT_CACHE_ENABLED"] = "false"
+
+from vector_search import load, make_queries, make_vectors, open_store
+
+
+def throughput(label: str, count: int, run) -> float:
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<24} {count / elapsed:>10.1f} queries/s")
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=250, help="Queries per search_batch call")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--backends", nargs="+", default=["numpy"], choices=["numpy", "chroma"])
+    parser.add_argument("--mmap", action="store_true")
+    parser.add_argument("--embed", action="store_true", help="Also time query embedding")
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors, args.dim, seed=0)
+    queries = make_queries(vectors, args.queries, noise=0.05)
+    batches = [queries[start:start + args.batch] for start in range(0, len(queries), args.batch)]
+
+    for backend in args.backends:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = open_store(backend, tmp, args.mmap)
+            load(store, vectors, 5000)
+            print(f"{backend}: {args.vectors} vectors, {args.queries} queries, top {args.top_k}")
+            single = throughput("search() per query", args.queries,
+                                lambda: [store.search(query, top_k=args.top_k) for query in queries])
+            batched = throughput(f"search_batch() x{args.batch}", args.queries,
+                                 lambda: [store.search_batch(batch, top_k=args.top_k) for batch in batches])
+            print(f"  speedup {batched / single:.1f}x")
+            del store
+
+    if args.embed:
+        from app.core.config import settings
+        from app.services.embedder import get_embedder
+        embedder = get_embedder(settings.EMBEDDING_MODEL, settings.OPENAI_API_KEY)
+        texts = [f"what does error code E{i:04d} mean for the pump assembly?" for i in range(args.queries)]
+        print(f"embedding: {settings.EMBEDDING_MODEL}")
+        single = throughput("encode() per query", len(texts), lambda: [embedder.encode([text]) for text in texts])
+        batched = throughput(f"encode() x{args.batch}", len(texts),
+                             lambda: [embedder.encode(texts[start:start + args.batch])
+                                      for start in range(0, len(texts), args.batch)])
+        print(f"  speedup {batched / single:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark chunking throughput (MB/s) of the available splitters.
+
+    python benchmarks/chunking.py --mb 5
+    python benchmarks/chunking.py --tokenizer sentence-transformers/all-MiniLM-L6-v2
+
+Splits page texts taken from data/sample_documents (repeated up to --mb
+megabytes) with:
+
+- the previous backend.py word loop (character budget, no overlap)
+- LangChain's RecursiveCharacterTextSplitter measured with len
+- TokenChunker, pages split in bulk; with --tokenizer it uses the model's
+  fast tokenizer, otherwise the regex approximation
+
+With a tokenizer, the largest chunk is also reported in model tokens.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.chunker import TokenChunker
+from app.services.extractors import get_extractor
+from app.services.pdf_processor import PDFProcessor
+
+DEFAULT_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data", "sample_documents")
+
+
+def legacy_chunk(text: str, chunk_size: int = 1000):
+    """backend.py chunk_text as it was before the vectorized chunker."""
+    chunks = []
+    current_chunk = []
+    current_length = 0
+    for word in text.split():
+        current_chunk.append(word)
+        current_length += len(word) + 1
+        if current_length >= chunk_size:
+            chunks.append(' '.join(current_chunk))
+            current_chunk = []
+            current_length = 0
+    if current_chunk:
+        chunks.append(' '.join(current_chunk))
+    return chunks
+
+
+def load_pages(directory: str, megabytes: float):
+    extractor = get_extractor()
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.pdf"))):
+        pages.extend(text for text in extractor.iter_page_texts(path) if text.strip())
+    if not pages:
+        sys.exit(f"No PDF text found in {directory}")
+    size = sum(len(page) for page in pages)
+    return pages * max(1, int(megabytes * 1e6 / size))
+
+
+def measure(name: str, megabytes: float, fn):
+    start = time.perf_counter()
+    chunks = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:8.2f}s {megabytes / elapsed:8.2f} MB/s  {chunks} chunks")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dir", default=DEFAULT_DIR)
+    parser.add_argument("--mb", type=float, default=5.0, help="Approximate amount of text to split")
+    parser.add_argument("--tokenizer", help="HuggingFace model whose tokenizer measures chunks")
+    parser.add_argument("--chunk-tokens", type=int, default=250)
+    parser.add_argument("--overlap-tokens", type=int, default=50)
+    args = parser.parse_args()
+
+    pages = load_pages(args.dir, args.mb)
+    megabytes = sum(len(page) for page in pages) / 1e6
+    print(f"{len(pages)} pages, {megabytes:.1f} MB of text")
+
+    characters = PDFProcessor(chunker="characters")
+    tokens = PDFProcessor(chunker="tokens", chunk_tokens=args.chunk_tokens,
+                          chunk_token_overlap=args.overlap_tokens, tokenizer_name=args.tokenizer)
+    batch = PDFProcessor.PAGE_BATCH_SIZE
+
+    def split_pages(processor):
+        return sum(len(splits) for start in range(0, len(pages), batch)
+                   for splits in processor._split_texts(pages[start:start + batch]))
+
+    measure("legacy word loop", megabytes, lambda: sum(len(legacy_chunk(page)) for page in pages))
+    measure("RecursiveCharacterSplitter", megabytes, lambda: split_pages(characters))
+    label = "TokenChunker (tokenizer)" if tokens.token_chunker.tokenizer else "TokenChunker (regex)"
+    measure(label, megabytes, lambda: split_pages(tokens))
+
+    tokenizer = tokens.token_chunker.tokenizer
+    if tokenizer is not None:
+        sample = pages[:batch]
+        longest = max(len(tokenizer(content, add_special_tokens=False)["input_ids"])
+                      for splits in tokens._split_texts(sample) for _, content in splits)
+        print(f"Largest chunk: {longest} tokens (limit {args.chunk_tokens})")
+
+
+if __name__ == "__main__":
+    main()
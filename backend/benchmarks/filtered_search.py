@@ -0,0 +1,113 @@
+"""Benchmark filtered against unfiltered vector search latency.
+
+    python benchmarks/filtered_search.py --vectors 1000000
+    python benchmarks/filtered_search.py --vectors 100000 --backends numpy chroma
+
+Loads --vectors random normalized vectors into a fresh store, grouped into
+documents of --chunks-per-document chunks with the metadata ingestion
+writes (file_id, source, page, uploaded_at, spread over a year). It then
+reports p50/p95 latency of --queries searches without a filter and with
+each of the filters /query accepts, plus the share of chunks each filter
+matches. The result cache is disabled.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ["RESULT_CACHE_ENABLED"] = "false"
+
+from vector_search import make_vectors, open_store
+
+DAY = 86400
+NOW = 1.7e9
+
+
+def metadata(i: int, chunks_per_document: int) -> dict:
+    document = i // chunks_per_document
+    return {
+        'file_id': f"file{document}",
+        'source': f"document_{document}.pdf",
+        'chunk_index': i % chunks_per_document,
+        'page': (i % chunks_per_document) // 3 + 1,
+        'uploaded_at': NOW - (document * 7919 % 365) * DAY
+    }
+
+
+def load(store, vectors: np.ndarray, chunks_per_document: int, batch: int = 5000):
+    for start in range(0, len(vectors), batch):
+        stop = min(start + batch, len(vectors))
+        documents = [
+            {'page_content': f"chunk {i}", 'metadata': metadata(i, chunks_per_document)}
+            for i in range(start, stop)
+        ]
+        store.add_documents(documents, vectors[start:stop], ids=[str(i) for i in range(start, stop)])
+
+
+def filters(documents: int) -> dict:
+    """Where clauses as RAGService builds them from /query filters."""
+    return {
+        "none": None,
+        "one file_id": {"file_id": {"$in": [f"file{documents // 2}"]}},
+        "10 filenames": {"source": {"$in": [f"document_{d}.pdf" for d in range(0, documents, max(1, documents // 10))][:10]}},
+        "pages 1-5": {"$and": [{"page": {"$gte": 1}}, {"page": {"$lte": 5}}]},
+        "last 30 days": {"uploaded_at": {"$gte": NOW - 30 * DAY}},
+        "file + pages": {"$and": [{"file_id": {"$in": [f"file{documents // 3}"]}}, {"page": {"$lte": 10}}]},
+    }
+
+
+def matched(where, count: int, chunks_per_document: int) -> float:
+    """Share of chunks a where clause matches, evaluated in Python."""
+    if where is None:
+        return 1.0
+    conditions = where.get("$and", [where])
+    ops = {"$in": lambda a, b: a in b, "$gte": lambda a, b: a >= b, "$lte": lambda a, b: a <= b}
+    sample = range(0, count, max(1, count // 20000))
+    hits = sum(
+        all(ops[op](metadata(i, chunks_per_document)[field], operand)
+            for condition in conditions for field, spec in condition.items() for op, operand in spec.items())
+        for i in sample
+    )
+    return hits / len(sample)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=1000000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--chunks-per-document", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--backends", nargs="+", default=["numpy"], choices=["numpy", "chroma"])
+    parser.add_argument("--mmap", action="store_true")
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors, args.dim, seed=0)
+    queries = make_vectors(args.queries, args.dim, seed=1)
+    documents = -(-args.vectors // args.chunks_per_document)
+
+    for backend in args.backends:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = open_store(backend, tmp, args.mmap)
+            start = time.perf_counter()
+            load(store, vectors, args.chunks_per_document)
+            print(f"{backend}: {args.vectors} vectors in {documents} documents, loaded in {time.perf_counter() - start:.1f}s")
+            print(f"  {'filter':<14} {'matches':>8} {'p50 ms':>8} {'p95 ms':>8}")
+            for name, where in filters(documents).items():
+                latencies = []
+                for query in queries:
+                    start = time.perf_counter()
+                    store.search(query, top_k=args.top_k, filter_by=where)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                share = matched(where, args.vectors, args.chunks_per_document)
+                print(f"  {name:<14} {share:>7.2%} {np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 95):>8.2f}")
+            del store
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark BM25 index build time, size and query latency.
+
+    python benchmarks/lexical_search.py --chunks 1000000
+    python benchmarks/lexical_search.py --chunks 100000 --max-postings 0 5000 50000
+
+Indexes --chunks synthetic chunks of --tokens words drawn from a Zipf
+distribution over a --vocabulary word vocabulary (so a few words appear
+everywhere, as "the" does), each also mentioning one error code shared by
+--chunks-per-code chunks. Chunks are added --batch at a time, as ingestion
+adds one document's chunks at a time. Reports p50/p95 latency for:
+
+- code: an exact identifier, e.g. "ERR-01234"
+- code + words: an identifier inside a natural-language question
+- words: three words of mixed frequency
+
+Latency is measured per --max-postings value on the same index (0: no
+cap, every query term is scored).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.lexical_index import BM25Index
+
+
+def make_chunks(start: int, stop: int, args, rng: np.random.Generator) -> list:
+    words = np.minimum(rng.zipf(1.2, size=(stop - start, args.tokens)), args.vocabulary)
+    return [
+        " ".join(f"w{word}" for word in row) + f" ERR-{i // args.chunks_per_code:05d}"
+        for i, row in zip(range(start, stop), words)
+    ]
+
+
+def queries(count: int, args, rng: np.random.Generator) -> dict:
+    codes = rng.integers(0, args.chunks // args.chunks_per_code, size=count)
+    words = np.minimum(rng.zipf(1.2, size=(count, 3)), args.vocabulary)
+    return {
+        "code": [f"ERR-{code:05d}" for code in codes],
+        "code + words": [f"what does w1 w2 error ERR-{code:05d} mean for w{w[2]}" for code, w in zip(codes, words)],
+        "words": [" ".join(f"w{word}" for word in row) for row in words],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=1000000)
+    parser.add_argument("--tokens", type=int, default=100, help="Words per chunk")
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--chunks-per-code", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--max-postings", type=int, nargs="+", default=[0, 100000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = BM25Index(path=tmp)
+        start = time.perf_counter()
+        for offset in range(0, args.chunks, args.batch):
+            stop = min(offset + args.batch, args.chunks)
+            index.add([str(i) for i in range(offset, stop)], make_chunks(offset, stop, args, rng))
+        stats = index.get_stats()
+        print(f"{args.chunks} chunks indexed in {time.perf_counter() - start:.1f}s: "
+              f"{stats['postings']} postings in {stats['segments']} segments, {stats['index_mb']} MB")
+
+        workload = queries(args.queries, args, rng)
+        print(f"{'cap':>6}  {'query':<13} {'p50 ms':>7} {'p95 ms':>7} {'hits':>5}")
+        for max_postings in args.max_postings:
+            index.max_postings = max_postings
+            for name, texts in workload.items():
+                latencies, hits = [], 0
+                for text in texts:
+                    start = time.perf_counter()
+                    hits += len(index.search(text, top_k=args.top_k))
+                    latencies.append((time.perf_counter() - start) * 1000)
+                print(f"{max_postings:>6}  {name:<13} {np.percentile(latencies, 50):>7.2f} "
+                      f"{np.percentile(latencies, 95):>7.2f} {hits / len(texts):>5.1f}")
+        del index
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark PDF text extraction time and peak memory.
+
+    python benchmarks/pdf_extraction.py --pages 1000
+
+Compares the previous extractor (string concatenation with page markers,
+whole document held in memory) against streaming PDFProcessor.iter_pages,
+and also reports full chunking via process_pdf. With --workers, page
+ranges are additionally extracted in a process pool of that size. Peak
+memory is the Python-heap peak measured with tracemalloc in a separate,
+untimed run (it does not include pool worker processes).
+
+    python benchmarks/pdf_extraction.py --pages 1000 --workers 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import PyPDF2
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.pdf_processor import PDFProcessor, shutdown_extract_pool
+from synthetic_pdf import write_pdf
+
+
+def legacy_extract(file_path: str):
+    """Extractor as it was before page-aware extraction."""
+    text = ""
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        pages = len(pdf_reader.pages)
+        for page_num in range(pages):
+            page_text = pdf_reader.pages[page_num].extract_text()
+            if page_text:
+                text += f"--- Page {page_num + 1} ---\n{page_text}\n\n"
+    return len(text)
+
+
+def streaming_extract(processor: PDFProcessor, file_path: str):
+    """Consume pages one at a time without keeping them."""
+    return sum(len(page.text) for page in processor.iter_pages(file_path))
+
+
+def measure(name: str, fn):
+    """Time one run, then repeat it under tracemalloc for the memory peak."""
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<22} {elapsed:8.2f}s  peak {peak / 1e6:8.1f} MB  ({result})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--pdf", help="Use an existing PDF instead of a synthetic one")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Also run parallel extraction with this many processes (0 = one per CPU)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.pdf
+        if path is None:
+            path = os.path.join(tmp, "synthetic.pdf")
+            write_pdf(path, args.pages)
+        processor = PDFProcessor()
+        print(f"{path}: {processor.count_pages(path)} pages")
+
+        measure("legacy concat", lambda: f"{legacy_extract(path)} chars")
+        measure("streaming pages", lambda: f"{streaming_extract(processor, path)} chars")
+        measure("process_pdf (chunks)", lambda: f"{len(processor.process_pdf(path, 'bench.pdf', 'bench')[0])} chunks")
+
+        if args.workers != 1:
+            parallel = PDFProcessor(extract_workers=args.workers, parallel_min_pages=1)
+            # Start the pool outside the timed runs
+            streaming_extract(parallel, path)
+            try:
+                measure(f"parallel pages x{parallel.extract_workers}",
+                        lambda: f"{streaming_extract(parallel, path)} chars")
+                measure("parallel process_pdf",
+                        lambda: f"{len(parallel.process_pdf(path, 'bench.pdf', 'bench')[0])} chunks")
+            finally:
+                shutdown_extract_pool()
+
+
+if __name__ == "__main__":
+    main()
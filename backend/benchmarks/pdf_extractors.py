@@ -0,0 +1,95 @@
+"""Benchmark PDF extraction backends for speed and fidelity.
+
+    python benchmarks/pdf_extractors.py
+    python benchmarks/pdf_extractors.py --reference pymupdf --min-fidelity 0.95
+
+Runs every installed backend over the PDFs in data/sample_documents (or
+--dir) and reports pages/sec. Fidelity is the Jaccard similarity of each
+document's word set against the --reference backend, averaged over
+documents; a backend passes when it reaches --min-fidelity. The fastest
+passing backend is the one to set as PDF_EXTRACTOR.
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.extractors import EXTRACTORS, get_extractor
+
+DEFAULT_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data", "sample_documents")
+
+WORD_RE = re.compile(r"\w+")
+
+
+def words(text: str) -> set:
+    return set(WORD_RE.findall(text.lower()))
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def run_backend(extractor, paths, repeat: int):
+    """Best-of-repeat wall time over all files, plus the extracted texts."""
+    best = float("inf")
+    texts = {}
+    pages = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pages = 0
+        for path in paths:
+            page_texts = list(extractor.iter_page_texts(path))
+            pages += len(page_texts)
+            texts[path] = "\n\n".join(page_texts)
+        best = min(best, time.perf_counter() - start)
+    return best, pages, texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dir", default=DEFAULT_DIR, help="Directory of PDFs to extract")
+    parser.add_argument("--reference", default="pypdf2", help="Backend used as the fidelity reference")
+    parser.add_argument("--min-fidelity", type=float, default=0.9)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.dir, "*.pdf")))
+    if not paths:
+        sys.exit(f"No PDFs found in {args.dir}")
+    print(f"{len(paths)} PDFs from {os.path.abspath(args.dir)}")
+
+    results = {}
+    for name in EXTRACTORS:
+        try:
+            extractor = get_extractor(name)
+        except ImportError:
+            print(f"{name:<10} not installed")
+            continue
+        results[name] = run_backend(extractor, paths, args.repeat)
+
+    if args.reference not in results:
+        sys.exit(f"Reference backend {args.reference} is not installed")
+    reference = {path: words(text) for path, text in results[args.reference][2].items()}
+
+    print(f"{'backend':<10} {'pages':>6} {'seconds':>9} {'pages/s':>9} {'fidelity':>9}")
+    passing = []
+    for name, (elapsed, pages, texts) in results.items():
+        fidelity = sum(jaccard(words(texts[path]), reference[path]) for path in paths) / len(paths)
+        ok = fidelity >= args.min_fidelity
+        if ok:
+            passing.append((pages / elapsed, name))
+        print(f"{name:<10} {pages:>6} {elapsed:>9.3f} {pages / elapsed:>9.1f} {fidelity:>9.3f}"
+              f"  {'pass' if ok else 'FAIL'}")
+
+    if passing:
+        print(f"Fastest backend meeting fidelity {args.min_fidelity}: {max(passing)[1]}")
+
+
+if __name__ == "__main__":
+    main()
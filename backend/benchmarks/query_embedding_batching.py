@@ -0,0 +1,77 @@
+"""Benchmark query embedding throughput with and without micro-batching.
+
+    python benchmarks/query_embedding_batching.py --clients 1 8 64
+
+For each client count, closed-loop clients embed distinct queries for a
+fixed duration, first one encode call per query (the previous behaviour)
+and then through EmbeddingBatcher. Reports queries per second and mean
+latency for both modes.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.core.config import settings
+from app.services.batcher import EmbeddingBatcher
+from app.services.embedder import get_embedder
+
+
+async def run_clients(embed, clients: int, duration: float):
+    """Run closed-loop clients; returns (queries, mean latency ms)."""
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def client(client_id: int):
+        n = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await embed(f"client {client_id} question {n} about retrieval augmented generation")
+            latencies.append((time.perf_counter() - start) * 1000)
+            n += 1
+
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    return len(latencies), sum(latencies) / max(1, len(latencies))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per run")
+    parser.add_argument("--max-batch-size", type=int, default=settings.QUERY_BATCH_MAX_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=settings.QUERY_BATCH_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    embedder = get_embedder(settings.EMBEDDING_MODEL, settings.OPENAI_API_KEY)
+    executor = ThreadPoolExecutor(max_workers=1)
+    loop = asyncio.get_running_loop()
+
+    async def unbatched(text: str):
+        return await loop.run_in_executor(executor, embedder.embed_query, text)
+
+    batcher = EmbeddingBatcher(
+        embedder.encode,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        executor=executor
+    )
+
+    # Warm up the model
+    await unbatched("warm up")
+
+    print(f"{'clients':>8} {'mode':>10} {'qps':>10} {'mean ms':>10}")
+    for clients in args.clients:
+        for mode, embed in (("single", unbatched), ("batched", batcher.embed)):
+            count, mean_latency = await run_clients(embed, clients, args.duration)
+            print(f"{clients:>8} {mode:>10} {count / args.duration:>10.1f} {mean_latency:>10.2f}")
+
+    print(f"batcher stats: {batcher.get_stats()}")
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
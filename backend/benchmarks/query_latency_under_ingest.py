@@ -0,0 +1,130 @@
+"""Benchmark query latency with and without concurrent PDF uploads.
+
+Requires httpx. Runs against a live API, e.g.:
+
+    uvicorn main:app --port 8000
+    python benchmarks/query_latency_under_ingest.py --url http://localhost:8000
+
+The same query workload is issued twice: once on an idle server and once
+while PDFs from the sample directory are uploaded in a loop (forced, so
+deduplication does not turn them into no-ops). With ingestion running in
+the worker pool, the p99 of both phases should stay close.
+"""
+import argparse
+import asyncio
+import glob
+import os
+import statistics
+import time
+from typing import List, Tuple
+
+import httpx
+
+DEFAULT_DOCS = os.path.join(os.path.dirname(__file__), "..", "..", "data", "sample_documents")
+
+QUERIES = [
+    "What is retrieval-augmented generation?",
+    "How are documents chunked?",
+    "Which embedding model is used?",
+    "What are the limitations of the approach?",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run_queries(client: httpx.AsyncClient, prefix: str, total: int, concurrency: int) -> List[float]:
+    """Issue `total` queries with bounded concurrency and return latencies in ms."""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            async with client.stream("POST", f"{prefix}/query", json={"query": QUERIES[i % len(QUERIES)], "top_k": 3}) as response:
+                async for _ in response.aiter_bytes():
+                    pass
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return latencies
+
+
+async def upload_loop(client: httpx.AsyncClient, prefix: str, files: List[str], stop: asyncio.Event) -> Tuple[int, int]:
+    """Upload PDFs repeatedly until `stop` is set; returns (accepted, rejected with 429) uploads.
+    
+    Uploads are forced, so re-sending the same files is ingested again
+    instead of resolving to the existing document.
+    """
+    accepted = rejected = 0
+    while not stop.is_set():
+        for path in files:
+            if stop.is_set():
+                break
+            with open(path, "rb") as f:
+                response = await client.post(
+                    f"{prefix}/upload",
+                    params={"force": "true"},
+                    files={"file": (os.path.basename(path), f, "application/pdf")}
+                )
+            if response.status_code == 429:
+                rejected += 1
+                # Queue full: back off briefly, but stop promptly when the phase ends
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            response.raise_for_status()
+            accepted += 1
+    return accepted, rejected
+
+
+def report(name: str, latencies: List[float]):
+    print(
+        f"{name:<16} n={len(latencies):<5} "
+        f"p50={percentile(latencies, 50):8.1f}ms "
+        f"p95={percentile(latencies, 95):8.1f}ms "
+        f"p99={percentile(latencies, 99):8.1f}ms "
+        f"mean={statistics.mean(latencies):8.1f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--prefix", default="/api", help="Path prefix of the API router")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--docs", default=DEFAULT_DOCS, help="Directory of PDFs to upload")
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(args.docs, "*.pdf")))
+    if not files:
+        raise SystemExit(f"No PDFs found in {args.docs}")
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+        # Warm up
+        await run_queries(client, args.prefix, len(QUERIES), 1)
+
+        idle = await run_queries(client, args.prefix, args.queries, args.concurrency)
+
+        stop = asyncio.Event()
+        uploader = asyncio.create_task(upload_loop(client, args.prefix, files, stop))
+        loaded = await run_queries(client, args.prefix, args.queries, args.concurrency)
+        stop.set()
+        accepted, rejected = await uploader
+
+    report("idle", idle)
+    report("during ingest", loaded)
+    print(f"uploads during ingest phase: {accepted} accepted, {rejected} rejected with 429 (queue full)")
+    if not accepted:
+        print("warning: no upload was accepted, so the ingest phase measured an idle server")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""Benchmark re-ingesting a revised document with PUT /documents/{file_id}.
+
+Requires httpx. Runs against a live API, e.g.:
+
+    uvicorn main:app --port 8000
+    python benchmarks/reingest.py --url http://localhost:8000 --pages 200 --changed 5
+
+Uploads a synthetic PDF, then a revision in which --changed pages differ,
+first as a brand-new upload and then as a replace of the original
+document. The replace should embed only chunks from the changed pages.
+Set CHUNK_CACHE_ENABLED=false on the server so the fresh upload is not
+served from the embedding cache.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import httpx
+
+from synthetic_pdf import write_pdf
+
+
+def wait_for_job(client: httpx.Client, prefix: str, file_id: str) -> dict:
+    """Poll the job status until it finishes."""
+    while True:
+        job = client.get(f"{prefix}/documents/{file_id}/status").json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.1)
+
+
+def send(client: httpx.Client, method: str, url: str, path: str) -> dict:
+    with open(path, "rb") as f:
+        response = client.request(method, url, files={"file": (os.path.basename(path), f, "application/pdf")})
+    response.raise_for_status()
+    return response.json()
+
+
+def timed_job(client: httpx.Client, prefix: str, file_id: str):
+    """Wait for a job and return it with its server-side duration."""
+    job = wait_for_job(client, prefix, file_id)
+    if job["status"] != "done":
+        raise SystemExit(f"Job {file_id} failed: {job['error']}")
+    return job, job["duration_seconds"]
+
+
+def report(name: str, job: dict, elapsed: float):
+    print(
+        f"{name:<14} {elapsed:8.2f}s  chunks={job['chunks']:<6} added={job['added_chunks']:<6} "
+        f"unchanged={job['unchanged_chunks']:<6} removed={job['removed_chunks']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--prefix", default="/api", help="API route prefix")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--changed", type=int, default=5, help="Pages that differ in the revision")
+    args = parser.parse_args()
+
+    # A fresh seed per run keeps whole-file dedup from short-circuiting the uploads
+    seed = random.randrange(1 << 30)
+    changed = random.Random(seed).sample(range(args.pages), args.changed)
+    with tempfile.TemporaryDirectory() as tmp, httpx.Client(base_url=args.url, timeout=600) as client:
+        original = os.path.join(tmp, "manual.pdf")
+        revision = os.path.join(tmp, "manual_rev2.pdf")
+        write_pdf(original, args.pages, seed=seed)
+        write_pdf(revision, args.pages, seed=seed, changed_pages=changed, revision=1)
+
+        file_id = send(client, "POST", f"{args.prefix}/upload", original)["file_id"]
+        report("initial", *timed_job(client, args.prefix, file_id))
+
+        fresh_id = send(client, "POST", f"{args.prefix}/upload", revision)["file_id"]
+        report("fresh upload", *timed_job(client, args.prefix, fresh_id))
+
+        send(client, "PUT", f"{args.prefix}/documents/{file_id}", revision)
+        report("replace", *timed_job(client, args.prefix, file_id))
+
+
+if __name__ == "__main__":
+    main()
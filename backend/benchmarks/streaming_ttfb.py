@@ -0,0 +1,125 @@
+"""Check time to first byte and first answer token of streamed queries.
+
+    python benchmarks/streaming_ttfb.py
+    python benchmarks/streaming_ttfb.py --first-token-ms 200 --token-ms 20 --concurrency 8
+
+Builds a RAGService in a temporary directory with the configured embedder
+and vector store backend, loads --chunks synthetic chunks, and swaps in the
+local stub LLM, which waits --first-token-ms before its first token and
+--token-ms between tokens. It then streams --queries queries through
+RAGService.query_documents, --concurrency at a time, and reports p50/p95 of:
+
+- ttfb: until the first event (the sources) reaches the client
+- first token: until the first answer piece reaches the client
+- overhead: first token minus ttfb minus the stub's own first-token delay,
+  i.e. the time the serving path adds between retrieval and the answer
+
+Exits with status 1 when p95 ttfb exceeds --max-ttfb-ms or p95 overhead
+exceeds --max-overhead-ms, so it can gate changes to the streaming path.
+The result cache is disabled and each query text is distinct.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ["RESULT_CACHE_ENABLED"] = "false"
+
+
+def load(service, chunks: int, batch: int = 500):
+    for start in range(0, chunks, batch):
+        stop = min(start + batch, chunks)
+        texts = [f"Section {i}: the pump assembly reports error code E{i:04d} when pressure drops." for i in range(start, stop)]
+        documents = [
+            {'page_content': text, 'metadata': {'file_id': f"file{i // 100}", 'source': f"manual_{i // 100}.pdf",
+                                                'chunk_index': i % 100, 'page': i % 100 // 3 + 1}}
+            for i, text in zip(range(start, stop), texts)
+        ]
+        ids = [f"chunk{i}" for i in range(start, stop)]
+        service.vector_store.add_documents(documents, service.embedder.encode(texts), ids=ids)
+        if service.lexical_index is not None:
+            service.lexical_index.add(ids, texts)
+
+
+async def stream(service, query: str, top_k: int) -> tuple:
+    """Client-side (ttfb, first token, total) in ms for one streamed query."""
+    start = time.perf_counter()
+    ttfb = first_token = None
+    async for event in service.query_documents(query, top_k=top_k):
+        now = (time.perf_counter() - start) * 1000
+        if ttfb is None:
+            ttfb = now
+        data = json.loads(event[len("data: "):])
+        if data["type"] == "error":
+            raise RuntimeError(data["message"])
+        if first_token is None and data["type"] == "answer_chunk":
+            first_token = now
+    return ttfb, first_token, (time.perf_counter() - start) * 1000
+
+
+async def run(service, args) -> np.ndarray:
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            return await stream(service, f"what does error code E{i % args.chunks:04d} mean? ({i})", args.top_k)
+
+    # One query first, so model warm-up is not measured
+    await stream(service, "warm-up", args.top_k)
+    return np.asarray(await asyncio.gather(*(one(i) for i in range(args.queries))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--first-token-ms", type=float, default=100.0, help="Stub LLM delay before its first token")
+    parser.add_argument("--token-ms", type=float, default=5.0, help="Stub LLM delay between tokens")
+    parser.add_argument("--tokens", type=int, default=50, help="Tokens per stub answer")
+    parser.add_argument("--max-ttfb-ms", type=float, default=250.0)
+    parser.add_argument("--max-overhead-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Every store path defaults to ./data, so this keeps the run out of the real data
+        os.chdir(tmp)
+        from app.services.generator import StubGenerator
+        from app.services.rag_service import RAGService
+
+        service = RAGService()
+        try:
+            load(service, args.chunks)
+            service.generator = StubGenerator(args.first_token_ms, args.token_ms, args.tokens)
+            latency = asyncio.run(run(service, args))
+        finally:
+            service.shutdown()
+
+    overhead = latency[:, 1] - latency[:, 0] - args.first_token_ms
+    print(f"{args.queries} queries over {args.chunks} chunks, concurrency {args.concurrency}, "
+          f"stub first token {args.first_token_ms:.0f}ms, {args.tokens} tokens {args.token_ms:.0f}ms apart")
+    print(f"  {'':<12} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, values in (("ttfb", latency[:, 0]), ("first token", latency[:, 1]),
+                         ("overhead", overhead), ("total", latency[:, 2])):
+        print(f"  {name:<12} {np.percentile(values, 50):>8.2f} {np.percentile(values, 95):>8.2f}")
+
+    failures = []
+    if np.percentile(latency[:, 0], 95) > args.max_ttfb_ms:
+        failures.append(f"p95 ttfb above {args.max_ttfb_ms:.0f}ms")
+    if np.percentile(overhead, 95) > args.max_overhead_ms:
+        failures.append(f"p95 overhead above {args.max_overhead_ms:.0f}ms")
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
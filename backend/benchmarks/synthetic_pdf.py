@@ -0,0 +1,60 @@
+"""Write synthetic multi-page text PDFs for benchmarks."""
+import random
+from typing import Iterable
+
+WORDS = (
+    "retrieval augmented generation combines a parametric language model with a "
+    "non-parametric memory index of dense passage embeddings queried at inference time "
+    "error code E1042 part number PN-7731 calibration procedure torque specification"
+).split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: int, lines_per_page: int = 40, words_per_line: int = 12, seed: int = 0,
+              changed_pages: Iterable[int] = (), revision: int = 0):
+    """Write a PDF with `pages` pages of random text in Helvetica.
+
+    Each page's text depends only on `seed` and its page number, except that
+    pages listed in `changed_pages` (0-based) also depend on `revision`; this
+    produces revisions of a document that differ in just those pages.
+    """
+    changed_pages = set(changed_pages)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, filled in once page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for page in range(pages):
+        rng = random.Random(f"{seed}:{page}:{revision if page in changed_pages else 0}")
+        lines = [f"Page {page + 1}"] + [
+            " ".join(rng.choice(WORDS) for _ in range(words_per_line)) for _ in range(lines_per_page)
+        ]
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+        ops += [f"({_escape(line)}) Tj T*" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
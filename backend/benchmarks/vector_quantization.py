@@ -0,0 +1,80 @@
+"""Benchmark recall@k, latency and index size of quantized vector storage.
+
+    python benchmarks/vector_quantization.py --vectors 200000 --tolerance 0.01
+    python benchmarks/vector_quantization.py --rescore-factor 1 2 4 8
+
+Loads --vectors random normalized vectors into a NumPy store once, then
+reopens it with each quantization (the quantized copy is built on open)
+and each --rescore-factor, running --queries searches against exact
+top-k computed with NumPy. Queries are perturbed copies of stored
+vectors; --noise controls how close the neighbours are.
+
+Exits non-zero if any quantized configuration loses more than
+--tolerance recall@k against float32.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ["RESULT_CACHE_ENABLED"] = "false"
+
+from vector_search import exact_top_k, load, make_queries, make_vectors
+
+
+def measure(store, queries: np.ndarray, truth: list, k: int):
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = store.search(query, top_k=k)
+        latencies.append(time.perf_counter() - start)
+        hits += len(expected & {int(result['id']) for result in results})
+    return np.percentile(latencies, 50) * 1000, hits / (k * len(queries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.05, help="Query perturbation (stddev per dimension)")
+    parser.add_argument("--rescore-factor", type=int, nargs="+", default=[4])
+    parser.add_argument("--tolerance", type=float, default=0.01, help="Allowed recall@k loss against float32")
+    parser.add_argument("--mmap", action="store_true")
+    args = parser.parse_args()
+
+    from app.services.numpy_store import NumpyVectorStore
+
+    vectors = make_vectors(args.vectors, args.dim, seed=0)
+    queries = make_queries(vectors, args.queries, args.noise)
+    truth = exact_top_k(vectors, queries, args.top_k)
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        load(NumpyVectorStore(path=tmp, mmap=args.mmap, quantization="none"), vectors, 5000)
+
+        print(f"{'quantization':<12} {'rescore':>7} {'index MB':>9} {'p50 ms':>8} {'recall@' + str(args.top_k):>10}")
+        baseline = None
+        for quantization in ("none", "float16", "int8"):
+            for factor in ([1] if quantization == "none" else args.rescore_factor):
+                store = NumpyVectorStore(path=tmp, mmap=args.mmap, quantization=quantization, rescore_factor=factor)
+                p50, recall = measure(store, queries, truth, args.top_k)
+                baseline = recall if baseline is None else baseline
+                within = recall >= baseline - args.tolerance
+                failed = failed or not within
+                print(f"{quantization:<12} {factor if quantization != 'none' else '-':>7} "
+                      f"{store.get_stats()['index_mb']:>9.1f} {p50:>8.2f} {recall:>10.3f}"
+                      f"{'' if within else '  (exceeds tolerance)'}")
+                del store
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
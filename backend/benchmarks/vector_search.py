@@ -0,0 +1,112 @@
+"""Benchmark query latency and recall@k of the vector store backends.
+
+    python benchmarks/vector_search.py --sizes 10000 100000 1000000
+    python benchmarks/vector_search.py --sizes 10000 --backends numpy --mmap
+
+For each size, loads that many random normalized vectors into a fresh
+store of each backend (in a temporary directory), then runs --queries
+searches and reports p50/p95 latency and recall@k against exact top-k
+computed with NumPy. Queries are perturbed copies of stored vectors, so
+each has a clear nearest neighbour. The result cache is disabled.
+
+Loading Chroma is the slow part at 1M vectors (expect most of an hour).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ["RESULT_CACHE_ENABLED"] = "false"
+
+
+def make_vectors(count: int, dim: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def make_queries(vectors: np.ndarray, count: int, noise: float) -> np.ndarray:
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, len(vectors), count)]
+    queries = queries + noise * rng.standard_normal(queries.shape, dtype=np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> list:
+    """Ground-truth neighbour sets, one query at a time to bound memory."""
+    truth = []
+    for query in queries:
+        scores = vectors @ query
+        truth.append(set(np.argpartition(-scores, k - 1)[:k].tolist()))
+    return truth
+
+
+def open_store(backend: str, path: str, mmap: bool):
+    from app.core.config import settings
+    settings.VECTOR_STORE_PATH = path
+    if backend == "numpy":
+        from app.services.numpy_store import NumpyVectorStore
+        return NumpyVectorStore(path=path, mmap=mmap)
+    from app.services.vector_store import VectorStore
+    return VectorStore()
+
+
+def load(store, vectors: np.ndarray, batch: int):
+    for start in range(0, len(vectors), batch):
+        stop = min(start + batch, len(vectors))
+        documents = [
+            {'page_content': f"chunk {i}", 'metadata': {'file_id': f"file{i // 100}", 'chunk_index': i}}
+            for i in range(start, stop)
+        ]
+        store.add_documents(documents, vectors[start:stop], ids=[str(i) for i in range(start, stop)])
+
+
+def measure(store, queries: np.ndarray, truth: list, k: int):
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = store.search(query, top_k=k)
+        latencies.append(time.perf_counter() - start)
+        hits += len(expected & {int(result['id']) for result in results})
+    latencies = np.array(latencies) * 1000
+    return np.percentile(latencies, 50), np.percentile(latencies, 95), hits / (k * len(queries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--backends", nargs="+", default=["numpy", "chroma"], choices=["numpy", "chroma"])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.05, help="Query perturbation (stddev per dimension)")
+    parser.add_argument("--mmap", action="store_true", help="Memory-map the numpy store")
+    parser.add_argument("--batch", type=int, default=5000, help="Rows per add_documents call while loading")
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'vectors':>9} {'load':>9} {'p50 ms':>8} {'p95 ms':>8} {'recall@' + str(args.top_k):>10}")
+    for size in args.sizes:
+        vectors = make_vectors(size, args.dim, seed=size)
+        queries = make_queries(vectors, args.queries, args.noise)
+        truth = exact_top_k(vectors, queries, args.top_k)
+
+        for backend in args.backends:
+            with tempfile.TemporaryDirectory() as tmp:
+                store = open_store(backend, tmp, args.mmap)
+                start = time.perf_counter()
+                load(store, vectors, args.batch)
+                loaded = time.perf_counter() - start
+
+                p50, p95, recall = measure(store, queries, truth, args.top_k)
+                print(f"{backend:<8} {size:>9} {loaded:>8.1f}s {p50:>8.2f} {p95:>8.2f} {recall:>10.3f}")
+                del store
+
+
+if __name__ == "__main__":
+    main()
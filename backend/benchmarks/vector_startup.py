@@ -0,0 +1,134 @@
+"""Benchmark vector store startup time and per-worker memory.
+
+    python benchmarks/vector_startup.py --vectors 100000 --workers 4
+    python benchmarks/vector_startup.py --vectors 100000 --backends numpy-mmap chroma
+
+Builds one store of --vectors random 384-d vectors per backend in a
+temporary directory, then starts --workers processes at once, as uvicorn
+--workers would. Each worker opens the store, runs --queries searches and
+reports:
+
+- open: time to construct the store
+- first query: time to answer the first search (for mmap, this faults
+  the mapped pages in)
+- rss: resident memory added by opening and searching
+- pss: the same, with pages shared between workers divided among them
+  (Linux only, from /proc/self/smaps_rollup)
+
+Backends: numpy-mmap (embeddings memory-mapped), numpy (read into each
+worker) and chroma (HNSW index loaded by each worker).
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ["RESULT_CACHE_ENABLED"] = "false"
+
+
+def memory_kb() -> dict:
+    """Rss and Pss of this process in kB (Pss is 0 where unavailable)."""
+    values = {"Rss": 0, "Pss": 0}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in values:
+                    values[key] = int(rest.split()[0])
+    except OSError:
+        import resource
+        values["Rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return values
+
+
+def open_store(backend: str, path: str):
+    from app.core.config import settings
+    settings.VECTOR_STORE_PATH = path
+    if backend.startswith("numpy"):
+        from app.services.numpy_store import NumpyVectorStore
+        return NumpyVectorStore(path=path, mmap=backend == "numpy-mmap")
+    from app.services.vector_store import VectorStore
+    return VectorStore()
+
+
+def build(backend: str, path: str, count: int, dim: int):
+    store = open_store(backend, path)
+    rng = np.random.default_rng(0)
+    for start in range(0, count, 5000):
+        stop = min(start + 5000, count)
+        vectors = rng.standard_normal((stop - start, dim), dtype=np.float32)
+        documents = [
+            {'page_content': f"chunk {i}", 'metadata': {'file_id': f"file{i // 100}", 'chunk_index': i}}
+            for i in range(start, stop)
+        ]
+        store.add_documents(documents, vectors, ids=[str(i) for i in range(start, stop)])
+
+
+def worker(backend: str, path: str, dim: int, queries: int, barrier, results):
+    # Import everything first so only the store itself is measured
+    from app.services import numpy_store, vector_store  # noqa: F401
+    before = memory_kb()
+
+    start = time.perf_counter()
+    store = open_store(backend, path)
+    opened = time.perf_counter() - start
+    rng = np.random.default_rng(os.getpid())
+    start = time.perf_counter()
+    store.search(rng.standard_normal(dim, dtype=np.float32), top_k=10)
+    first_query = time.perf_counter() - start
+    for _ in range(queries - 1):
+        store.search(rng.standard_normal(dim, dtype=np.float32), top_k=10)
+
+    # Measure while every worker holds the store, so shared pages are split
+    barrier.wait()
+    after = memory_kb()
+    results.put((opened, first_query, after["Rss"] - before["Rss"], after["Pss"] - before["Pss"]))
+    barrier.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--backends", nargs="+", default=["numpy-mmap", "numpy"],
+                        choices=["numpy-mmap", "numpy", "chroma"])
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    size_mb = args.vectors * args.dim * 4 / 2**20
+    print(f"{args.vectors} vectors ({size_mb:.0f} MB float32), {args.workers} workers")
+    print(f"{'backend':<11} {'open p50':>9} {'open max':>9} {'1st query':>10} {'rss/worker':>11} {'pss/worker':>11}")
+    for backend in args.backends:
+        with tempfile.TemporaryDirectory() as tmp:
+            build(backend, tmp, args.vectors, args.dim)
+
+            barrier = context.Barrier(args.workers)
+            results = context.Queue()
+            processes = [
+                context.Process(target=worker, args=(backend, tmp, args.dim, args.queries, barrier, results))
+                for _ in range(args.workers)
+            ]
+            for process in processes:
+                process.start()
+            measured = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+
+            opened = np.array([item[0] for item in measured]) * 1000
+            first_query = np.median([item[1] for item in measured]) * 1000
+            rss = np.mean([item[2] for item in measured]) / 1024
+            pss = np.mean([item[3] for item in measured]) / 1024
+            print(f"{backend:<11} {np.median(opened):>7.1f}ms {opened.max():>7.1f}ms {first_query:>8.1f}ms "
+                  f"{rss:>9.1f}MB {pss:>9.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
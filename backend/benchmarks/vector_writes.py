@@ -0,0 +1,81 @@
+"""Benchmark bulk-loading documents into the vector store (rows/sec).
+
+    python benchmarks/vector_writes.py --documents 10000 --chunks 1
+
+Loads --documents small documents of --chunks rows each into a fresh
+Chroma collection in a temporary directory, twice:
+
+- direct: one VectorStore.add_documents call (and commit) per document
+- buffered: --threads writers submit through VectorWriteBuffer, which
+  coalesces them into writes of up to --batch-size rows
+
+Vectors are random and normalized, so no embedding model is needed.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def make_documents(count: int, chunks: int, dim: int, prefix: str):
+    """Per-document (documents, embeddings, ids) triples."""
+    rng = np.random.default_rng(0)
+    for doc in range(count):
+        embeddings = rng.standard_normal((chunks, dim), dtype=np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        file_id = f"{prefix}{doc}"
+        documents = [
+            {'page_content': f"document {doc} chunk {i}", 'metadata': {'file_id': file_id, 'chunk_index': i}}
+            for i in range(chunks)
+        ]
+        yield documents, embeddings, [f"{file_id}_{i}" for i in range(chunks)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--chunks", type=int, default=1, help="Rows per document")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--threads", type=int, default=2, help="Concurrent ingest jobs in the buffered run")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--flush-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["VECTOR_STORE_PATH"] = tmp
+        from app.services.vector_store import VectorStore
+        from app.services.write_buffer import VectorWriteBuffer
+
+        store = VectorStore()
+        rows = args.documents * args.chunks
+
+        start = time.perf_counter()
+        for documents, embeddings, ids in make_documents(args.documents, args.chunks, args.dim, "direct-"):
+            store.add_documents(documents, embeddings, ids=ids)
+        elapsed = time.perf_counter() - start
+        print(f"direct    {rows} rows {elapsed:8.2f}s {rows / elapsed:10.0f} rows/s")
+
+        buffer = VectorWriteBuffer(store, batch_size=args.batch_size, flush_interval_ms=args.flush_ms)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            futures = list(pool.map(
+                lambda item: buffer.add(*item),
+                make_documents(args.documents, args.chunks, args.dim, "buffered-")
+            ))
+            for future in futures:
+                future.result()
+        elapsed = time.perf_counter() - start
+        buffer.close()
+        stats = buffer.get_stats()
+        print(f"buffered  {rows} rows {elapsed:8.2f}s {rows / elapsed:10.0f} rows/s  "
+              f"({stats['flushes']} writes, avg {stats['avg_flush_size']:.0f} rows)")
+
+
+if __name__ == "__main__":
+    main()
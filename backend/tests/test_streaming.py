@@ -0,0 +1,105 @@
+"""Streaming /query: the answer reaches the client token by token.
+
+Drives the ASGI app directly, so every body message is timestamped when the
+server sends it, with the stub LLM standing in for a model that takes a
+while per token. Catches anything on the serving path (endpoint, service,
+middleware) that holds the answer back until generation completes.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+FIRST_TOKEN_MS = 50.0
+TOKEN_MS = 20.0
+TOKENS = 20
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    """The API app with a few chunks stored, in a temporary working directory."""
+    cwd = os.getcwd()
+    # Every store path defaults to ./data, so this keeps the test out of the real data
+    os.chdir(tmp_path_factory.mktemp("app"))
+    os.makedirs("static", exist_ok=True)
+    os.environ["RESULT_CACHE_ENABLED"] = "false"
+    try:
+        from main import app
+        from app.api.endpoints import rag_service
+        from app.services.generator import StubGenerator
+
+        texts = [f"Section {i}: the pump assembly reports error code E{i:04d} when pressure drops." for i in range(20)]
+        documents = [
+            {'page_content': text, 'metadata': {'file_id': "file0", 'source': "manual.pdf",
+                                                'chunk_index': i, 'page': i + 1}}
+            for i, text in enumerate(texts)
+        ]
+        ids = [f"chunk{i}" for i in range(len(texts))]
+        rag_service.vector_store.add_documents(documents, rag_service.embedder.encode(texts), ids=ids)
+        if rag_service.lexical_index is not None:
+            rag_service.lexical_index.add(ids, texts)
+        rag_service.generator = StubGenerator(FIRST_TOKEN_MS, TOKEN_MS, TOKENS)
+        yield app
+        rag_service.shutdown()
+    finally:
+        os.chdir(cwd)
+
+
+async def post_stream(app, path: str, payload: dict) -> list:
+    """POST to the app and return (seconds since the request, SSE event) for each event sent."""
+    body = json.dumps(payload).encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"testserver"), (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())],
+        "client": ("testclient", 50000), "server": ("testserver", 80),
+    }
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # The client stays connected until the response ends
+        await asyncio.Event().wait()
+
+    start = time.perf_counter()
+    events = []
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            now = time.perf_counter() - start
+            for event in message["body"].decode().split("\n\n"):
+                if event.startswith("data: "):
+                    events.append((now, json.loads(event[len("data: "):])))
+
+    await app(scope, receive, send)
+    return events
+
+
+def test_first_token_arrives_before_generation_completes(app):
+    from app.core.config import settings
+
+    events = asyncio.run(post_stream(app, f"/api{settings.API_V1_STR}/query",
+                                     {"query": "what does error code E0007 mean?", "top_k": 3}))
+    types = [data["type"] for _, data in events]
+    assert "error" not in types, events
+    assert types[0] == "sources"
+
+    tokens = [at for at, data in events if data["type"] == "answer_chunk"]
+    assert len(tokens) == TOKENS
+    # The stub spends (TOKENS - 1) * TOKEN_MS after its first token; a buffered
+    # answer would arrive all at once, at the end of that
+    assert tokens[-1] - tokens[0] > (TOKENS - 1) * TOKEN_MS / 1000 / 2
+    assert events[0][0] < tokens[0]
+
+    timings = next(data["timings"] for _, data in events if data["type"] == "timings")
+    assert timings["ttfb_ms"] < timings["first_token_ms"] < timings["total_ms"]
@@ -67,23 +67,29 @@ async def upload_file(file: UploadFile = File(...)):
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Only PDF files are allowed")
         
-        # Read file content
-        content = await file.read()
-        file_size = len(content)
-        
-        # Increased limit to 100MB
-        MAX_SIZE = 100 * 1024 * 1024  # 100MB
-        if file_size > MAX_SIZE:
-            raise HTTPException(status_code=400, detail=f"File too large. Max size: 100MB, your file: {file_size/(1024*1024):.1f}MB")
-        
         # Generate unique ID
         file_id = str(uuid.uuid4())
         safe_filename = f"{file_id}_{file.filename}"
         file_path = os.path.join("uploads", safe_filename)
         
-        # Save file
-        async with aiofiles.open(file_path, 'wb') as f:
-            await f.write(content)
+        # Save file in fixed-size chunks, aborting as soon as the limit is exceeded
+        MAX_SIZE = 100 * 1024 * 1024  # 100MB
+        CHUNK_SIZE = 1024 * 1024  # 1MB
+        file_size = 0
+        try:
+            async with aiofiles.open(file_path, 'wb') as f:
+                while True:
+                    chunk = await file.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    file_size += len(chunk)
+                    if file_size > MAX_SIZE:
+                        raise HTTPException(status_code=413, detail="File too large. Max size: 100MB")
+                    await f.write(chunk)
+        except BaseException:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
         
         print(f"File saved: {file_path} ({file_size} bytes)")
         